@@ -29,9 +29,19 @@
 
 ### import required modules
 
+import array            # typed arrays
+import bisect           # sorted sequence search
+import collections      # container datatypes
 import copy             # object copy support
+import heapq            # heap queue
+import itertools        # iterator tools
 import math             # mathematical support
+import operator         # standard operators as functions
+import os               # operating system interface
 import random           # random generation
+import select           # wait for i/o completion
+import socket           # network sockets
+import struct           # binary data packing
 import sys              # sys constants
 
 
@@ -40,6 +50,25 @@ import sys              # sys constants
 __version__ = '0.12.3'
 __author__ = 'Fabrizio Pollastri <f.pollastri@inrim.it>'
 
+# bts file: header layout, magic, version and flags bits.
+_BTS_HEADER = struct.Struct('<4sHH8s8sdQ')
+_BTS_MAGIC = 'BTS\0'
+_BTS_VERSION = 1
+_BTS_VOID = 0x01
+_BTS_FLOAT_EDGES = 0x02
+_BTS_FLOAT_START = 0x04
+_BTS_FLOAT_END = 0x08
+_BTS_SLEVEL = 0x10
+_BTS_FLOAT_TSCALE = 0x20
+
+# packed signal: header layout, magic, edges codings and compressions.
+_CODEC_HEADER = struct.Struct('<4sBBH8s8sddQ')
+_CODEC_MAGIC = 'BTSP'
+_CODEC_RAW = 0
+_CODEC_VARINT = 1
+_CODEC_TICKS = 2
+_CODEC_COMPRESSIONS = [None,'zlib','bz2','lzma']
+
 
 #### classes
 
@@ -57,6 +86,25 @@ DOWN_HEAVY_HORIZONTAL_LIGHT = u'\u2530'
 UP_HEAVY_AND_HORIZONTAL_LIGHT = u'\u2538'
 HEAVY_UP = u'\u2579'
 HEAVY_DOWN = u'\u257b'
+LIGHT_DOWN_AND_HORIZONTAL = u'\u252c'
+
+# plotchar cell characters (top, bottom), indexed by level at cell start,
+# level at cell end and cell edges number (0, 1, 2 or more):
+# start level * 6 + end level * 3 + edges. Last cell is out of domain.
+_PLOTCHAR_CELLS = [
+    (' ',LIGHT_HORIZONTAL),
+    (HEAVY_DOWN,UP_HEAVY_AND_HORIZONTAL_LIGHT),
+    (HEAVY_DOWN,UP_HEAVY_AND_HORIZONTAL_LIGHT),
+    (DOWN_HEAVY_AND_RIGHT_LIGHT,UP_HEAVY_AND_LEFT_LIGHT),
+    (LIGHT_DOWN_AND_RIGHT,LIGHT_UP_AND_LEFT),
+    (DOWN_HEAVY_AND_RIGHT_LIGHT,UP_HEAVY_AND_LEFT_LIGHT),
+    (DOWN_HEAVY_AND_LEFT_LIGHT,UP_HEAVY_AND_RIGHT_LIGHT),
+    (LIGHT_DOWN_AND_LEFT,LIGHT_UP_AND_RIGHT),
+    (DOWN_HEAVY_AND_LEFT_LIGHT,UP_HEAVY_AND_RIGHT_LIGHT),
+    (LIGHT_HORIZONTAL,' '),
+    (DOWN_HEAVY_HORIZONTAL_LIGHT,HEAVY_UP),
+    (DOWN_HEAVY_HORIZONTAL_LIGHT,HEAVY_UP),
+    (' ',' ')]
 
 
 class Signal:
@@ -205,6 +253,7 @@ class Signal:
         in signal object. Return *other*. """
 
         # copy all self attributes into other
+        other.unindex()
         other.start = self.start
         other.edges = self.edges[:]
         other.end = self.end
@@ -241,6 +290,7 @@ class Signal:
 
         # if nonzero offset, add it.
         if offset:
+            sig.unindex()
             sig.start += offset
             for i in range(len(self)):
                     sig.edges[i] += offset
@@ -270,6 +320,7 @@ class Signal:
             sig.slevel = not sig.slevel
 
         # reverse change times, not first and last times (start and end).
+        sig.unindex()
         for i in range(len(sig)):
             sig.edges[i] = sig.start + sig.end - sig.edges[i]
 
@@ -328,6 +379,7 @@ class Signal:
             if inplace:
                 older = Signal(self.start,self.edges,self.end,self.slevel,
                     self.tscale)
+                self.unindex()
                 self.start = None
                 self.edges = []
                 self.end = None
@@ -344,6 +396,7 @@ class Signal:
 
         # newer signal part: post split time.
         if inplace:
+            self.unindex()
             self.start = split
             self.edges = self.edges[split_pos:]
             self.slevel = level
@@ -393,6 +446,7 @@ class Signal:
 
         # older signal part: pre split time. 
         if inplace:
+            self.unindex()
             self.edges = self.edges[0:split_pos]
             self.end = split
             older = self
@@ -441,6 +495,7 @@ class Signal:
 
         # the newer signal part: post split time.
         if inplace:
+            self.unindex()
             self.start = split
             self.edges = self.edges[split_pos:]
             self.slevel = level
@@ -452,6 +507,32 @@ class Signal:
         return newer
 
 
+    def window(self,t0,t1):
+        """ Return the part of *self* from time *t0* to time *t1*, clipped to
+        the signal domain, as a new signal object. Edges are searched by
+        bisection and only the edges inside the time window are copied.
+        An edge at *t0* is put into the returned signal, an edge at *t1* is
+        not, unless *t1* is the signal end. If the window is outside the
+        signal domain or *self* is void, return the void signal. """
+
+        # void is window invariant
+        if not self:
+            return Signal()
+
+        start = max(self.start,t0)
+        end = min(self.end,t1)
+        if end <= start:
+            return Signal()
+
+        start_pos = bisect.bisect_left(self.edges,start)
+        if end < self.end:
+            end_pos = bisect.bisect_left(self.edges,end,start_pos)
+        else:
+            end_pos = len(self)
+
+        return self.view([start,start_pos,end_pos,end])
+
+
     def join(self,other,inplace=False):
         """ Join two signals (*self* and *other*) in one signal. 
         End time of *self* must be less or equal to start time of *other*.
@@ -490,6 +571,7 @@ class Signal:
 
         # join
         if inplace:
+            self.unindex()
             self.edges += other.edges
             self.end = other.end
             return self
@@ -498,23 +580,44 @@ class Signal:
                 slevel=self.slevel)
 
 
-    def chop(self,period,origin=None,max_chops=1000):
+    def chop(self,period,origin=None,max_chops=None):
         """ Divide the signal into several time contiguous signals with the
         same elapse time equal to *period*. The dividing times sequence
         starts at *origin* and has an element every *period* time, except for
-        the last element. It has end time = period * max_chops, if max_chops
-        is reached. Otherwise, it has the end time of the chopped signal.
-        Return a list with the chopped signals.
+        the last element that has the end time of the chopped signal.
+        Return a list with the chopped signals, at most *max_chops* signals
+        if *max_chops* is not None. See **ichop** for the other arguments. """
+
+        return list(itertools.islice(self.ichop(period,origin),max_chops))
+
+
+    def ichop(self,period,origin=None,views=False):
+        """ Iterate over the division of the signal into time contiguous
+        signals with the same elapse time equal to *period*, as **chop** does,
+        without chops number limit. Chops are computed one at a time: chop
+        boundaries are found by a forward binary search over the edges, so
+        iterating over all chops takes O(n log n) time and signal edges are
+        never copied again.
+        The dividing times sequence starts at *origin* and has an element
+        every *period* time, except for the last element that has the end
+        time of the chopped signal.
         If *origin* is before the signal start, it is moved forward by an
         integer times of period, until it falls into the signal domain.
         If *origin* is none, it is set to self start time by default.
-        If *origin* is after the signal end, no chop occours,
-        an empty list is returned.
-        If *self* is void, return an empty chop list. """
-
-        # if self is void, return an empty chop list.
+        If *origin* is after the signal end, a copy of *self* is the only chop.
+        If *self* is void, there are no chops.
+        If *views* is false, yield signal objects. Each chop has a copy of
+        the edges inside its time elapse only. If *views* is true, yield
+        views of *self* without any edge copy, see **view**.
+        If *period* is not positive, ValueError is raised. """
+
+        if not period > 0:
+            raise ValueError('chop period must be > 0.'
+                + '\n  found period: %s' % repr(period))
+
+        # if self is void, no chops.
         if not self:
-            return []
+            return
 
         # if not defined, set origin default.
         org = origin
@@ -523,71 +626,203 @@ class Signal:
 
         # if origin after signal end, return signal copy.
         if self.end <= org:
-            return [self.clone()]
-
-        # preserve original signal from internal manipulations
-        signal = self.clone()
+            if views:
+                yield [self.start,0,len(self),self.end]
+            else:
+                yield self.clone()
+            return
 
         # if origin before signal domain, set it to the first split in
         # signal domain
         if org <= self.start:
-            split =  self.start + period - (self.start - org) % float(period)
+            first = self.start
+            org = self.start + period - (self.start - org) % float(period)
         # if origin inside signal domain, discard signal part before origin.
         else:
-            discard = signal.split(origin,inplace=True)
-            split = org + period
-
-        # init loop vars
-        chops = []
-        # for each chop time, chop signal until max_chops is reached or the
-        # signal end is reached.
-        for c in range(1,max_chops):
-            older, newer = signal.split(split,inplace=True)
-            chops.append(older)
+            first = org
+            org = org + period
+
+        # for each chop time, chop signal until the signal end is reached.
+        # An edge at chop time belongs to the newer chop.
+        start_pos = bisect.bisect_left(self.edges,first)
+        split = org
+        count = 0
+        while True:
+            if self.end <= split:
+                view = [first,start_pos,len(self),self.end]
+            else:
+                end_pos = bisect.bisect_left(self.edges,split,start_pos)
+                view = [first,start_pos,end_pos,split]
+            if views:
+                yield view
+            else:
+                yield self.view(view)
             if self.end <= split:
                 break
-            split += period
+            first = split
+            start_pos = view[2]
+            count += 1
+            split = org + count * period
+
+
+    def view(self,view):
+        """ Return the part of *self* selected by *view* as a new signal
+        object. A view is a list [*start*, *start_pos*, *end_pos*, *end*]:
+        the time domain of the part and the positions of its first edge and
+        of the edge after its last one in *self* edges. The edges of the
+        view are copied into the returned signal. """
+
+        start, start_pos, end_pos, end = view
+
+        return Signal(start,self.edges[start_pos:end_pos],end,
+            self.slevel ^ (start_pos & 1),self.tscale)
+
+
+    def jitter(self,stddev=0,model='gauss',order='reject',amplitude=0.,
+            period=1.,phase=0.,seed=None,tries=10):
+        """ Add a random jitter to the change times of *self* signal object.
+        All jitter offsets are drawn at once and applied with array
+        operations, so a signal with millions of edges is jittered in a
+        few array passes. Requires Numpy.
+        Signal start and end times are unchanged.
+
+          **stddev**: positive float, the standard deviation of the zero mean
+          gaussian random component of the jitter. For the *walk* model it
+          is the standard deviation of each random walk step.
+
+          **model**: string, the jitter model.
+          *'gauss'*: gaussian jitter with standard deviation *stddev*.
+          *'walk'*: random walk, the offset of each edge is the offset of
+          the previous edge plus a gaussian step.
+          *'sine'*: periodic jitter, *amplitude* sin(2 pi t / *period* +
+          *phase*) plus the gaussian component.
+          *'dirac'*: Dual-Dirac jitter, +*amplitude* or -*amplitude* with
+          equal probability plus the gaussian component.
+
+          **order**: string, how the edges that would cross a neighbour
+          edge or the signal domain boundaries are resolved.
+          *'reject'*: the edge keeps its original time.
+          *'clip'*: the edge is clipped inside the mid points between its
+          original neighbour edges.
+          *'resample'*: the random component of the edge is drawn again,
+          up to *tries* times, then the edge is rejected.
+
+          **amplitude**: float, the peak offset of the *sine* and *dirac*
+          models.
+
+          **period**, **phase**: float, period and phase of the *sine* model.
+
+          **seed**: None, integer or numpy.random.RandomState. The random
+          generator seed. If None, the seed is drawn from the *random* module,
+          so random.seed() makes jitter repeatable.
+
+          **tries**: positive integer, max number of redraws of the
+          *resample* order.
 
-        return chops
+        Return the number of edges whose jitter was rejected or clipped. """
 
- 
-    def jitter(self,stddev=0):
-        """ Add a gaussian jitter to the change times of *self* signal object
-        with the given standard deviation *stddev* and zero mean.
-        Signal start and end times are unchanged. """
+        import numpy as np
 
         # void is jitter invariant
         if not self:
-            return
+            return 0
 
         # if not edges, return
         if not self.edges:
-            return
+            return 0
+
+        # original edges and random generator
+        orig = np.asarray(self.edges,dtype=float)
+        size = len(orig)
+        rand = _random_state(seed)
+
+        # jitter offsets: a fixed base part plus a gaussian random part
+        rnd = rand.normal(0.,stddev,size) if stddev else np.zeros(size)
+        if model == 'gauss':
+            base = np.zeros(size)
+        elif model == 'walk':
+            base = np.zeros(size)
+            np.cumsum(rnd[:-1],out=base[1:])
+        elif model == 'sine':
+            base = amplitude * np.sin(2. * math.pi * orig / period + phase)
+        elif model == 'dirac':
+            base = np.where(rand.randint(0,2,size),amplitude,-amplitude)
+        else:
+            raise ValueError('unknown jitter model: %s' % repr(model))
+        if not order in ('reject','clip','resample'):
+            raise ValueError('unknown jitter order: %s' % repr(order))
+        new = orig + base + rnd
+        self.unindex()
+
+        # clip each edge between the mid points of its original neighbours:
+        # clip ranges of adjacent edges are disjoint, so order is preserved.
+        if order == 'clip':
+            lower = np.empty(size)
+            upper = np.empty(size)
+            lower[0] = self.start
+            lower[1:] = (orig[:-1] + orig[1:]) * 0.5
+            upper[:-1] = lower[1:]
+            upper[-1] = self.end
+            lower = np.minimum(np.nextafter(lower,np.inf),orig)
+            upper = np.maximum(np.nextafter(upper,-np.inf),orig)
+            clipped = np.clip(new,lower,upper)
+            changed = int(np.count_nonzero(clipped != new))
+            self.edges = clipped.tolist()
+            return changed
+
+        # edges out of order with respect to jittered neighbours
+        def out_of_order(new,fixed):
+            ext = np.concatenate(([self.start],new,[self.end]))
+            bad = (ext[1:-1] <= ext[:-2]) | (ext[2:] <= ext[1:-1])
+            return bad & ~fixed
+
+        # if required, draw again the random part of out of order edges
+        fixed = np.zeros(size,dtype=bool)
+        if order == 'resample' and stddev:
+            for t in range(tries):
+                bad = out_of_order(new,fixed)
+                count = np.count_nonzero(bad)
+                if not count:
+                    break
+                new[bad] = orig[bad] + base[bad] + rand.normal(0.,stddev,count)
+
+        # reject out of order edges restoring their original time, until
+        # all edges are ordered. Original times are ordered, so it ends.
+        while True:
+            bad = out_of_order(new,fixed)
+            if not bad.any():
+                break
+            new[bad] = orig[bad]
+            fixed |= bad
+
+        self.edges = new.tolist()
+
+        return int(np.count_nonzero(fixed))
 
-        # first jittered change must fall between start and second change or end
-        new_time = self.edges[0] + random.gauss(0.0,stddev)
-        if len(self) > 1:
-            top_limit = self.edges[1]
+
+    def deglitch(self,width,inplace=False):
+        """ Remove from *self* all pulses, at level 0 or 1, shorter than
+        *width*. Edges are scanned in time order, an edge closer than *width*
+        to the last kept edge cancels it, so a sequence of short pulses is
+        removed as a whole. The parts before the first edge and after the
+        last edge are not pulses and are kept.
+        If *inplace* is false, return the result as a new signal object.
+        Otherwise, return the result as *self*. """
+
+        # set where to return result
+        if inplace:
+            sig = self
         else:
-            top_limit = self.end
-        if self.start < new_time and  new_time < top_limit:
-            self.edges[0] = new_time
+            sig = self.clone()
 
-        # if only one change, jittering is terminated.
-        if len(self) == 1:
-            return
+        # void is deglitch invariant
+        if not sig:
+            return sig
 
-        # add jitter to signal all change times except first and last
-        for i in range(1,len(self)-1):
-            new_time = self.edges[i] + random.gauss(0.0,stddev)
-            # if current edge has room to be moved forward or back, add jitter.
-            if self.edges[i - 1] < new_time and new_time < self.edges[i + 1]:
-                self.edges[i] = new_time
+        sig.unindex()
+        sig.edges = collect(ideglitch([sig],width)).edges
 
-        # last jittered change must fall between the last but one change or end
-        new_time = self.edges[-1] + random.gauss(0.0,stddev)
-        if self.edges[-2] < new_time and  new_time < self.end:
-            self.edges[-1] = new_time
+        return sig
 
 
     def __add__(self,other):
@@ -596,6 +831,48 @@ class Signal:
         return self.join(other,inplace=False)
 
 
+    def __array__(self,dtype=None):
+        """ Return the edge times of *self* as a numpy array, so a signal
+        can be given to numpy functions, with *dtype*, if given. Requires
+        Numpy. """
+
+        import numpy as np
+
+        return np.array(self.edges,dtype=dtype)
+
+
+    def __getstate__(self):
+        """ Return the state of *self* for pickling and copying: the edges
+        are packed as little endian 64 bit floats or integers, as in the bts
+        file format, not as a list of numbers. So pickles do not depend on
+        the platform. If edges do not fit 64 bits, they are kept as a list.
+        """
+
+        state = self.__dict__.copy()
+        state.pop('_index',None)
+        if self.edges:
+            code = type(self.edges[0]) == float and 'd' or 'q'
+            try:
+                state['edges'] = code, \
+                    struct.pack('<%d%s' % (len(self.edges),code),*self.edges)
+            except struct.error:
+                pass
+
+        return state
+
+
+    def __setstate__(self,state):
+        """ Restore the state of *self* from *state*, see
+        **__getstate__**. """
+
+        edges = state['edges']
+        if type(edges) == tuple:
+            code, data = edges
+            state['edges'] = list(struct.unpack('<%d%s' % (len(data) // 8,
+                code),data))
+        self.__dict__.update(state)
+
+
     def __len__(self):
         """ Return the length of the change times sequence. """
 
@@ -618,7 +895,7 @@ class Signal:
                 print 'signal a and b are equal' """
 
         if self and other:
-            return self.__dict__ == other.__dict__
+            return self._bts() == other._bts()
         else:
             return not self and not other
 
@@ -633,11 +910,17 @@ class Signal:
                 print 'signal a and b are different'"""
 
         if self and other:
-            return self.__dict__ != other.__dict__
+            return self._bts() != other._bts()
         else:
             return self or other
 
 
+    def _bts(self):
+        """ Return the tuple of the BTS format elements of *self*. """
+
+        return self.start, self.edges, self.end, self.slevel, self.tscale
+
+
     def _intersect(self,other):
         """ Compute the time intersection of two signals, if exists. 
         Return the start and end time of intersection, for each signal,
@@ -863,44 +1146,273 @@ class Signal:
             return sig
         
         # apply inversion
+        sig.unindex()
         sig.slevel = not sig.slevel
 
         return sig
 
 
-    def integral(self,level=1,normalize=False):
+    def integral(self,level=1,normalize=False,t0=None,t1=None):
         """ Return the integral of a signal object: the elapsed time of all
         periods in which the signal is at the level specified by *level*.
         Output can be absolute (*normalize=False*) or can be normalized
-        (*normalize=True*): absolute integral averaged over the whole signal
-        domain. The summation is operated on the signal domain only.
+        (*normalize=True*): absolute integral averaged over the integration
+        window. The summation is operated on the time window from *t0* to
+        *t1*, clipped to the signal domain. If *t0* or *t1* is None, the
+        window starts at signal start or ends at signal end.
+        If *self* has an index (see **index**), the integral is computed in
+        O(log n) time, otherwise the edges inside the window are summed.
         If *self* is void, return none. """
 
         # if self is void, return none.
         if not self:
             return None
 
-        # do summation between first and last signal edges
-        edges_int = 0
-        for i in range(0,len(self),2):
-            try:
-                edges_int += self.edges[i + 1] - self.edges[i]
-            except:
-                edges_int += self.end - self.edges[-1]
+        # integration window
+        start = self.start if t0 is None else max(self.start,t0)
+        end = self.end if t1 is None else min(self.end,t1)
+        if end <= start:
+            return 0.
+
+        # window high time from index
+        index = self._indexed()
+        if index:
+            high = self._high_time(index,end) - self._high_time(index,start)
+            if hasattr(high,'item'):
+                high = high.item()
+
+        # whole signal: do summation between first and last signal edges
+        elif t0 is None and t1 is None:
+            edges_int = 0
+            for i in range(0,len(self),2):
+                try:
+                    edges_int += self.edges[i + 1] - self.edges[i]
+                except:
+                    edges_int += self.end - self.edges[-1]
+
+            # return summation of level=0 or =1 as requested by level argument
+            if level ^ self.slevel:
+                integral = edges_int
+            else:
+                integral = self.end - self.start - edges_int
+
+            # return normalized if requested by normalized argument
+            if normalize:
+                integral = float(integral) / (self.end - self.start)
+
+            return integral
 
-        # return summation of level=0 or =1 as requested by level argument
-        if level ^ self.slevel:
-            integral = edges_int
+        # window high time from edges inside window
         else:
-            integral = self.end - self.start - edges_int
+            first = bisect.bisect_right(self.edges,start)
+            last = bisect.bisect_right(self.edges,end)
+            high = 0
+            time = start
+            lev = self.slevel ^ (first & 1)
+            for i in range(first,last):
+                if lev:
+                    high += self.edges[i] - time
+                time = self.edges[i]
+                lev = not lev
+            if lev:
+                high += end - time
+
+        # return high or low time as requested by level argument
+        if level:
+            integral = high
+        else:
+            integral = end - start - high
 
         # return normalized if requested by normalized argument
         if normalize:
-            integral = float(integral) / (self.end - self.start)
+            integral = float(integral) / (end - start)
+
+        return integral
+
+
+    def duty(self,t0=None,t1=None):
+        """ Return the duty cycle of *self*: the fraction of time at level 1
+        inside the time window from *t0* to *t1*. For the window and the
+        computation time see **integral**. If *self* is void, return none. """
+
+        return self.integral(1,True,t0,t1)
+
+
+    def integrals(self,windows,level=1,normalize=False):
+        """ Return the integrals of *self* over many time windows at once:
+        the elapsed time at *level* inside each window. *windows* is a
+        sequence of (*t0*, *t1*) pairs or an array with shape (n,2).
+        Windows are clipped to the signal domain, empty windows have zero
+        integral. If *normalize* is true, each integral is divided by its
+        window elapse (empty windows give NaN). The index of *self* is used,
+        if any, otherwise a temporary one is built. Return a numpy array
+        of floats. Requires Numpy. """
+
+        import numpy as np
+
+        windows = np.asarray(windows,dtype=float).reshape(-1,2)
+
+        # if self is void, return none for each window
+        if not self:
+            return np.full(len(windows),np.nan)
+
+        index = self._indexed() or self._make_index()
+        start = np.clip(windows[:,0],self.start,self.end)
+        end = np.clip(windows[:,1],start,self.end)
+        integral = self._high_time(index,end) - self._high_time(index,start)
+        if not level:
+            integral = end - start - integral
+        if normalize:
+            with np.errstate(invalid='ignore',divide='ignore'):
+                integral = integral / (end - start)
 
         return integral
 
 
+    def moving_average(self,window,step=None,origin=None):
+        """ Compute the exact moving average of *self* over a trailing time
+        window: the mean level of the signal from *t* - *window* to *t*.
+        The moving average is piecewise linear, it changes slope only where
+        an edge enters or leaves the window, so it is fully described by its
+        values at these breakpoints, computed with one sweep over the edges.
+        Requires Numpy.
+
+          **window**: positive float, the averaging window elapse.
+
+          **step**: None or positive float. If None, return the breakpoints.
+          If float, return the moving average sampled on a regular time grid
+          with *step* pitch.
+
+          **origin**: None or float, a time of the sampling grid. If None, it
+          is the first time with a full window: signal start + *window*.
+
+        Return pattern **(** *times, values* **)**
+
+          **times**: numpy array of floats, the breakpoint times or the grid
+          times, inside the range from signal start + *window* to signal end.
+
+          **values**: numpy array of floats, the moving average at *times*.
+
+        If *self* is void or shorter than *window*, return empty arrays. """
+
+        import numpy as np
+
+        # if self is void or too short, return empty arrays.
+        if not self or self.end - self.start < window:
+            return np.array([],dtype=float), np.array([],dtype=float)
+
+        # first full window, window head and tail positions and levels.
+        time = self.start + window
+        head = bisect.bisect_right(self.edges,time)
+        tail = bisect.bisect_right(self.edges,self.start)
+        head_level = self.slevel ^ (head & 1)
+        tail_level = self.slevel ^ (tail & 1)
+        value = self.integral(1,t0=self.start,t1=time) / float(window)
+        times = [time]
+        values = [value]
+
+        # sweep edges entering the window at head and leaving it at tail,
+        # the average slope is (head level - tail level) / window.
+        edges = self.edges
+        imax = len(self)
+        inf = float('inf')
+        while True:
+            head_time = edges[head] if head < imax else inf
+            tail_time = edges[tail] + window if tail < imax else inf
+            next_time = min(head_time,tail_time,self.end)
+            value += (head_level - tail_level) * (next_time - time) \
+                / float(window)
+            time = next_time
+            times.append(time)
+            values.append(value)
+            if time >= self.end:
+                break
+            if head_time == time:
+                head_level ^= 1
+                head += 1
+            if tail_time == time:
+                tail_level ^= 1
+                tail += 1
+
+        times = np.array(times,dtype=float)
+        values = np.array(values,dtype=float)
+
+        # if required, sample the piecewise linear average on a grid.
+        if step:
+            if origin is None:
+                origin = times[0]
+            first = math.ceil((times[0] - origin) / float(step))
+            last = math.floor((times[-1] - origin) / float(step))
+            grid = origin + np.arange(first,last + 1) * step
+            grid = grid[(times[0] <= grid) & (grid <= times[-1])]
+            return grid, np.interp(grid,times,values)
+
+        return times, values
+
+
+    def index(self):
+        """ Build the cumulative high time index of *self*: the time at
+        level 1 from signal start to each edge. With the index, **integral**
+        and **duty** compute any window in O(log n) time. The index is
+        dropped by the methods changing the signal in place. After direct
+        changes to signal attributes, as *edges* items, **unindex** must be
+        called. Return *self*.
+        Requires Numpy. """
+
+        self._index = self._make_index()
+
+        return self
+
+
+    def unindex(self):
+        """ Drop the cumulative high time index of *self*, if any.
+        Return *self*. """
+
+        self.__dict__.pop('_index',None)
+
+        return self
+
+
+    def _make_index(self):
+        """ Return a new cumulative high time index of *self*: a tuple with
+        the array of signal start and edge times and the array of high times
+        from signal start to each of them. """
+
+        import numpy as np
+
+        times = np.empty(len(self) + 1,dtype=np.result_type(self.start,
+            *self.edges[:1]))
+        times[0] = self.start
+        times[1:] = self.edges
+        high = np.zeros(len(times),dtype=times.dtype)
+        # high segments: level before edge i is slevel ^ (i & 1)
+        segments = np.diff(times)
+        segments[(np.arange(len(segments)) & 1) == self.slevel] = 0
+        np.cumsum(segments,out=high[1:])
+
+        return times, high
+
+
+    def _indexed(self):
+        """ Return the index of *self*, if any. Otherwise, return none. """
+
+        return self.__dict__.get('_index')
+
+
+    def _high_time(self,index,time):
+        """ Return the time at level 1 from signal start to *time* (scalar
+        or array, inside signal domain) using *index*. """
+
+        import numpy as np
+
+        times, high = index
+        pos = np.searchsorted(times,time,side='right') - 1
+        # level after times[pos] is slevel ^ (pos & 1)
+        lev = (pos & 1) ^ self.slevel
+
+        return high[pos] + (time - times[pos]) * lev
+
+
     def correlation(self,other,mask=None,step_size=1.,
             skip=0,width=None,normalize=False):
         """ Return the correlation function of two given signal objects:
@@ -1071,9 +1583,213 @@ class Signal:
         return phase, corr_max, corrs, shifts
 
 
+    @classmethod
+    def from_samples(cls,samples,rate,start=0.,chunk_size=1 << 20,tscale=1.):
+        """ Return the signal sampled by *samples*, a sequence or an array
+        of logic levels, any nonzero value is a 1 level. Samples are taken
+        at *rate* samples per time unit, the first one at time *start*. An
+        edge is at the time of the first sample of each new level. The
+        signal ends one sample period after the last sample.
+        Samples are processed in chunks of *chunk_size*, so a memory mapped
+        array larger than memory may be given.
+        Requires Numpy. """
+
+        import numpy as np
+
+        samples = np.asarray(samples)
+        chunks = ((samples[i:i + chunk_size] != 0).view(np.uint8)
+            for i in range(0,len(samples),chunk_size))
+
+        return _words2signals(chunks,[0],rate,start,len(samples),tscale)[0]
+
+
+    @classmethod
+    def from_packed(cls,data,rate,start=0.,lanes=None,bitorder='big',
+            chunk_size=1 << 20,tscale=1.):
+        """ Return the signals sampled by *data*, an array of packed
+        samples. If *lanes* is None, *data* is an array of bytes, each with
+        8 samples of one signal, the first one in the most significant bit
+        if *bitorder* is 'big', in the least significant bit if it is
+        'little'. Return the signal.
+        Otherwise, *data* is an array of unsigned integer words, each with
+        one sample of many signals, one for each bit lane. *lanes* is the
+        number of lanes, from bit 0, or the list of the bit positions of the
+        lanes. Return the list of signals, one for each lane.
+        For the other arguments see **from_samples**.
+        Requires Numpy. """
+
+        import numpy as np
+
+        data = np.asarray(data)
+
+        # bit stream: unpack bytes into samples
+        if lanes is None:
+            def unpack(chunk):
+                bits = np.unpackbits(chunk.view(np.uint8))
+                if bitorder == 'little':
+                    bits = bits.reshape(-1,8)[:,::-1].ravel()
+                return bits
+            chunks = (unpack(data[i:i + chunk_size])
+                for i in range(0,len(data),chunk_size))
+            return _words2signals(chunks,[0],rate,start,len(data) * 8,
+                tscale)[0]
+
+        # words: one signal for each lane
+        if type(lanes) == int:
+            lanes = range(lanes)
+        chunks = (data[i:i + chunk_size]
+            for i in range(0,len(data),chunk_size))
+
+        return _words2signals(chunks,lanes,rate,start,len(data),tscale)
+
+
+    @classmethod
+    def from_analog(cls,samples,rate,threshold,hysteresis=0.,start=0.,
+            chunk_size=1 << 20,tscale=1.):
+        """ Return the signal given by a comparator with hysteresis fed by
+        *samples*, a sequence or an array of analog values. Samples are
+        taken at *rate* samples per time unit, the first one at time
+        *start*. The comparator switches to level 1 at values greater or
+        equal to *threshold* + *hysteresis* / 2 and to level 0 at values
+        lower than *threshold* - *hysteresis* / 2, otherwise it holds its
+        level. The start level is given by the first sample against
+        *threshold*. Edge times are linearly interpolated between the
+        samples around the switching value. The signal ends one sample
+        period after the last sample.
+        Samples are processed in chunks of *chunk_size*, so a memory mapped
+        array larger than memory may be given.
+        Requires Numpy. """
+
+        import numpy as np
+
+        samples = np.asarray(samples)
+        if not len(samples):
+            return Signal()
+
+        rate = float(rate)
+        upper = threshold + hysteresis / 2.
+        lower = threshold - hysteresis / 2.
+        slevel = level = int(samples[0] >= threshold)
+        last = samples[0]
+        edges = []
+        for offset in range(0,len(samples),chunk_size):
+            chunk = np.asarray(samples[offset:offset + chunk_size],dtype=float)
+
+            # comparator state: set, reset or hold the last set or reset.
+            marks = np.full(len(chunk),-1,np.int8)
+            marks[chunk >= upper] = 1
+            marks[chunk < lower] = 0
+            held = np.where(marks >= 0,np.arange(len(chunk)),-1)
+            np.maximum.accumulate(held,out=held)
+            states = np.where(held >= 0,marks[held],level)
+
+            # switching samples, interpolate times from previous samples.
+            prev_states = np.empty_like(states)
+            prev_states[0] = level
+            prev_states[1:] = states[:-1]
+            pos = np.flatnonzero(states != prev_states)
+            if len(pos):
+                prev = np.empty_like(chunk)
+                prev[0] = last
+                prev[1:] = chunk[:-1]
+                x0 = prev[pos]
+                cross = np.where(states[pos],upper,lower)
+                fraction = (cross - x0) / (chunk[pos] - x0)
+                edges.extend(
+                    ((pos + offset - 1 + fraction) / rate + start).tolist())
+
+            level = states[-1]
+            last = chunk[-1]
+
+        # a sample exactly at a zero hysteresis threshold gives a rising and
+        # a falling edge at the same time: a void pulse, drop both.
+        edges = np.asarray(edges)
+        if len(edges) > 1:
+            runs = np.flatnonzero(np.diff(edges,prepend=np.nan) != 0)
+            counts = np.diff(np.append(runs,len(edges)))
+            edges = edges[runs[counts & 1 == 1]]
+
+        return Signal(start,edges.tolist(),start + len(samples) / rate,slevel,
+            tscale)
+
+
+    def to_samples(self,rate,t0=None,t1=None,packed=False,antialias=False):
+        """ Return *self* sampled at *rate* samples per time unit, from
+        time *t0* (default signal start) to time *t1* (default signal end)
+        excluded, as a numpy array of booleans. An edge at a sample time is
+        before it, so **from_samples** gives back *self*. Samples out of
+        the signal domain have its start or end level.
+        If *packed* is true, return the samples packed into an array of
+        bytes, the first sample in the most significant bit of the first
+        byte, see **from_packed**.
+        If *antialias* is true, return instead an array of floats: the
+        fraction of each sample period at level 1, as **integrals** with
+        normalization does, periods out of the signal domain count as level
+        0.
+        Requires Numpy. """
+
+        import numpy as np
+
+        # if self is void, no samples.
+        if not self:
+            return np.zeros(0,dtype=bool)
+
+        if t0 is None:
+            t0 = self.start
+        if t1 is None:
+            t1 = self.end
+        rate = float(rate)
+
+        def sample_index(times):
+            """ Return the index of the first sample at or after *times*. """
+            index = np.ceil((times - t0) * rate).astype(np.int64)
+            index[index / rate + t0 < times] += 1
+            index[(index - 1) / rate + t0 >= times] -= 1
+            return index
+
+        count = max(int(sample_index(np.array([t1],dtype=float))[0]),0)
+
+        # fraction of sample period at level 1
+        if antialias:
+            index = self._indexed() or self._make_index()
+            bounds = np.arange(count + 1) / rate + t0
+            high = self._high_time(index,np.clip(bounds,self.start,self.end))
+            return np.diff(high) * rate
+
+        # level toggles at the first sample after each edge, as edge index
+        # into samples, then levels by cumulative toggles parity.
+        first = bisect.bisect_right(self.edges,t0)
+        last = bisect.bisect_right(self.edges,t0 + (count - 1) / rate)
+        index = sample_index(np.array(self.edges[first:last],dtype=float))
+        toggles = np.bincount(index,minlength=count + 1)[:count]
+        samples = np.cumsum(toggles,dtype=np.int64) & 1
+        samples ^= (first & 1) ^ self.slevel
+        samples = samples.astype(bool)
+
+        if packed:
+            return np.packbits(samples)
+
+        return samples
+
+
+    def save(self,filename):
+        """ Save *self* into the binary file *filename*, in the bts file
+        format, see **load**. The file is written at once: a fixed size
+        header followed by the raw edge times. Requires Numpy. """
+
+        import numpy as np
+
+        flags, start, end = _bts_flags(self)
+
+        with open(filename,'wb') as bts:
+            bts.write(_bts_pack_header(flags,start,end,self.tscale,len(self)))
+            np.asarray(self.edges,dtype=_bts_dtype(flags)).tofile(bts)
+
+
     def plot(self,*args,**kargs):
         """ Graphic plot of signal *self* as square wave. Requires Matplotlib.
-        *\*args* and *\**kargs* are passed on to matplotlib functions."""
+        *\*args* and *\**kargs* are passed on to matplotlib functions.
+        For signals with many edges, see **plot_envelope**."""
 
         # void is no plot
         if not self:
@@ -1101,10 +1817,83 @@ class Signal:
             plot([self.start]+self.edges+[self.end],levels,**kargs)
 
 
+    def envelope(self,t0,t1,bins):
+        """ Return the envelope of *self* from time *t0* to time *t1*,
+        divided into *bins* equal time bins, as plotted by
+        **plot_envelope**. Edges are counted into bins by one vectorized
+        bisection, using the index of *self*, if any.
+        Return pattern **(** *bounds, levels, toggles* **)**: the arrays of
+        the *bins* + 1 bin bounds, of the signal levels at bounds and of the
+        number of edges into each bin, an edge at a bound is into the bin
+        before it. Requires Numpy. """
+
+        import numpy as np
+
+        index = self._indexed() or self._make_index()
+        bounds = np.linspace(t0,t1,bins + 1)
+        pos = np.searchsorted(index[0][1:],bounds,side='right')
+
+        return bounds, (pos & 1) ^ self.slevel, np.diff(pos)
+
+
+    def plot_envelope(self,width=None,axes=None,**kargs):
+        """ Graphic plot of signal *self* as square wave, decimated for
+        signals with many edges. The visible time range is divided into
+        *width* bins, default the plot width in pixels: the signal levels
+        at bin bounds are drawn as a square wave and bins with two or more
+        edges are marked by a vertical line. When the visible time range
+        changes, as by zoom or pan, the plot is computed again, so its cost
+        does not depend on the number of edges. *axes* is the matplotlib
+        axes to plot into, default the current one. *\**kargs* are passed
+        on to matplotlib plot function.
+        Return pattern **(** *line, marks* **)**: the matplotlib artists of
+        square wave and of marks. Requires Matplotlib and Numpy. """
+
+        # void is no plot
+        if not self:
+            return
+
+        import numpy as np
+        from matplotlib.pyplot import gca
+
+        if axes is None:
+            axes = gca()
+        kargs.update({'drawstyle':'steps-post'})
+        line = axes.plot([],[],**kargs)[0]
+        marks = axes.vlines([],0,1,colors=line.get_color())
+
+        # build the index once, for all redraws.
+        if not self._indexed():
+            self.index()
+
+        def redraw(axes):
+            t0, t1 = axes.get_xlim()
+            t0 = max(t0,self.start)
+            t1 = min(t1,self.end)
+            if t1 <= t0:
+                line.set_data([],[])
+                marks.set_segments([])
+                return
+            bins = width or max(int(axes.bbox.width),1)
+            bounds, levels, toggles = self.envelope(t0,t1,bins)
+            line.set_data(bounds,levels)
+            busy = ((bounds[:-1] + bounds[1:]) / 2.)[toggles > 1]
+            marks.set_segments(np.stack([np.stack([busy,np.zeros(len(busy))],
+                1),np.stack([busy,np.ones(len(busy))],1)],1))
+
+        axes.set_xlim(self.start,self.end)
+        axes.set_ylim(-0.1,1.1)
+        axes.set_yticks([0,1])
+        redraw(axes)
+        axes.callbacks.connect('xlim_changed',redraw)
+
+        return line, marks
+
+
     def plotchar(self,charnum,origin=None,end=None,max_flat=None):
         """ Semigraphic plot of signal *self* with unicode line drawing
         characters (U+25xx).
-        Require locale setting.
+        Require locale setting. Requires Numpy.
 
           **charnum**: integer, the maximum length of the string of the rendering
           characters.
@@ -1133,74 +1922,14 @@ class Signal:
             origin = self.start
         if end is None:
             end = self.end
-       
-        # initial level and edge number
-        olevel, oedge = self.level(origin,0)
 
-        # for each rendering char, examine input and output levels, examine
-        # how many edges fall into char time elapse and set proper rendering.
+        # for each rendering char, append its top and bottom chars to the
+        # rendering strings.
         topchars = []
         botchars = []
         flat_count = 0
-        for c in range(charnum):
-            # end of char time becomes start time
-            ilevel = olevel
-            iedge = oedge
-            # origin to end of char
-            org = origin + (end - origin) * (c + 1) / float(charnum)
-            # signal level at end of char, edges number before end of char.
-            olevel, oedge = self.level(org,iedge)
-
-            # pad rending outside signal domain
-            if ilevel is None or olevel is None:
-                topchar = ' '
-                botchar = ' '
-
-            # Compute top and bottom chars of current char position from
-            # signal levels at char position start time (ilevel), end time
-            # (olevel) and number of signal edges between this two times.
-            else:
-                # number of edges in current char elapse
-                diffedge = oedge - iedge
-
-                if ilevel:
-                    if olevel:
-                        # thick top tee: in 1, out 1, edges => 1 . 
-                        if diffedge:
-                            topchar = DOWN_HEAVY_HORIZONTAL_LIGHT
-                            botchar = HEAVY_UP
-                        # top line: in 1, out 1, edges = 0
-                        else:
-                            topchar = LIGHT_HORIZONTAL
-                            botchar = ' '
-                    else:
-                        # falling edge: in 1, out 0, edges = 1 .
-                        if diffedge == 1:
-                            topchar = LIGHT_DOWN_AND_LEFT
-                            botchar = LIGHT_UP_AND_RIGHT
-                        # thick falling edge: in 1, out 0, edges > 1 .
-                        else:
-                            topchar = DOWN_HEAVY_AND_LEFT_LIGHT
-                            botchar = UP_HEAVY_AND_RIGHT_LIGHT
-                else:
-                    if olevel:
-                        # raising edge: in 0, out 1, edges = 1 .
-                        if diffedge == 1:
-                            topchar = LIGHT_DOWN_AND_RIGHT
-                            botchar = LIGHT_UP_AND_LEFT
-                        # thick falling edge: in 0, out 1, edges > 1 .
-                        else:
-                            topchar = DOWN_HEAVY_AND_RIGHT_LIGHT
-                            botchar = UP_HEAVY_AND_LEFT_LIGHT
-                    else:
-                        # thick bottom tee: in 0, out 0, edges => 1 . 
-                        if diffedge:
-                            topchar = HEAVY_DOWN
-                            botchar = UP_HEAVY_AND_HORIZONTAL_LIGHT
-                        # bottom line: in 1, out 1, edges = 0
-                        else:
-                            topchar = ' '
-                            botchar = LIGHT_HORIZONTAL
+        cells = self._plotchar_cells(charnum,origin,end)
+        for c, (topchar, botchar) in enumerate(cells):
 
             # if required, do flat levels time compression
             if max_flat:
@@ -1256,130 +1985,1628 @@ class Signal:
         return topchars, botchars
 
 
-    def stream(self,other,elapse,buf_step=1.):
+    def _plotchar_cells(self,charnum,origin,end):
+        """ Return the list of the (top, bottom) rendering characters of
+        the *charnum* cells of **plotchar**, from time *origin* to time
+        *end*. The levels at cell bounds and the edges into each cell are
+        computed for all cells by one bisection, then characters are taken
+        from a lookup table. Requires Numpy. """
+
+        import numpy as np
+
+        # cell bounds, edges before them, as level method does.
+        bounds = np.empty(charnum + 1)
+        bounds[0] = origin
+        bounds[1:] = origin + (end - origin) \
+            * np.arange(1,charnum + 1) / float(charnum)
+        pos = np.searchsorted(np.asarray(self.edges,dtype=float),bounds)
+        levels = (pos & 1) ^ self.slevel
+        inside = (self.start <= bounds) & (bounds <= self.end)
+
+        # lookup table index
+        cells = levels[:-1] * 6 + levels[1:] * 3 + np.minimum(np.diff(pos),2)
+        cells[~(inside[:-1] & inside[1:])] = len(_PLOTCHAR_CELLS) - 1
+
+        return [_PLOTCHAR_CELLS[cell] for cell in cells]
+
+
+    def stream(self,other,elapse=None,buf_step=1.,max_edges=None):
         """ Append *other* signal to *self* signal. If self signal elapse time
         becomes greater than *elapse*, delete from the older part of self until
         its elapse time is less or equal than *elapse*. The elapsed time fo the
-        deleted part is forced to a integer multiple of *buf_step*. """
+        deleted part is forced to a integer multiple of *buf_step*.
+        If self signal has more than *max_edges* (positive integer) edges,
+        delete from the older part of self until it has *max_edges* edges,
+        the kept part starts at its first edge. If *elapse* or *max_edges* is
+        None, the corresponding limit is not applied. Each delete copies the
+        kept edges, for amortized constant time streaming see
+        **StreamBuffer**. """
 
         self.append(other)
 
-        # and the "appendend" self.
-        if self.elapse() <= elapse:
-            return (Signal(),self)
+        # if required, reduce self elapse time below elapse argument
+        discard = Signal()
+        if not elapse is None and self.elapse() > elapse:
+
+            # compute shift to be applied, if any.
+            shift = (int((self.elapse() - elapse) / buf_step) + 1) * buf_step
 
-        # compute shift to be applied, if any.
-        shift = (int((self.elapse() - elapse) / buf_step) + 1) * buf_step
+            # reduce self elapse time below elapse argument
+            discard, keep = self.split(self.start + shift,inplace=True)
 
-        # reduce self elapse time below elapse argument
-        discard, keep = self.split(self.start + shift,inplace=True)
+        # if required, reduce self edges number to max_edges argument
+        if not max_edges is None and len(self) > max_edges:
+            older, keep = self.split(self.edges[len(self) - max_edges],
+                inplace=True)
+            discard = discard.join(older)
 
         # return discarded part (before split) and kept part (after split).
-        return (discard,keep)
+        return (discard,self)
 
 
-#### functions
+class LogicOperator:
+    """
+    Implements an incremental logic operator over two growing signals.
+    *operator* is 'and', 'or', 'xor' or a function of two logic levels
+    returning a logic level. New tail segments of the two input signals are
+    given to **feed**, that returns only the new part of the output signal.
+    The sweep state, input levels and not yet processed input edges, is
+    kept between calls, so each update costs O(new edges).
+    """
 
-def code2mod(code,symbols,origin=0,tscale=1.):
-    """ Modulate a code sequence into a modulation signal in BTS format.
-    For each number in code, the symbol in symbols with index equal to number is
-    appended to the modulation signal. 
-    Return a Signal class object.
-    *code* is list of integer.
-    *symbols* is a list of signal objects, one for each coding symbol.
-    *origin* is the start time of the first coded symbol. """
+    operators = {
+        'and': lambda a,b: a and b,
+        'or': lambda a,b: a or b,
+        'xor': lambda a,b: a ^ b}
+
+    def __init__(self,operator='and'):
+
+        self.operator = self.operators.get(operator,operator)
+        # per input: start time, end time, level at output end, edges
+        # not yet processed.
+        self.starts = [None,None]
+        self.ends = [None,None]
+        self.levels = [0,0]
+        self.pending = [collections.deque(),collections.deque()]
+        # output end time and level
+        self.end = None
+        self.level = None
+
+
+    def feed(self,a=None,b=None):
+        """ Append signal *a* to the first input and signal *b* to the second
+        input. Both can be None or void. Each appended signal must start at
+        the end time of the previous signal of the same input, with the same
+        level. Return the new output signal part, from the previous output
+        end time to the earliest input end time, or the void signal if the
+        output does not advance. Input edges at this time are processed with
+        the next update. """
+
+        # append new input segments
+        for i, sig in enumerate((a,b)):
+            if not sig:
+                continue
+            if self.ends[i] is None:
+                self.starts[i] = sig.start
+                self.levels[i] = sig.slevel
+            else:
+                assert self.ends[i] == sig.start, \
+                    'input %d end differ from new segment start.\n' % i \
+                    + 'input end = ' + repr(self.ends[i]) \
+                    + ' , segment start = ' + repr(sig.start)
+            self.pending[i].extend(sig.edges)
+            self.ends[i] = sig.end
+
+        # both inputs are required
+        if None in self.ends:
+            return Signal()
 
-    # modulate all code items
-    mod = symbols[code[0]].shift(origin)
-    for number in code[1:]:
-        symbol = symbols[number]
-        mod.join(symbol.shift(mod.end-symbol.start),inplace=True)
+        # output start: inputs intersection start, skip edges before it.
+        if self.end is None:
+            start = max(self.starts)
+            if min(self.ends) <= start:
+                return Signal()
+            for i in (0,1):
+                pending = self.pending[i]
+                while pending and pending[0] < start:
+                    pending.popleft()
+                    self.levels[i] ^= 1
+            self.end = start
+            self.level = int(bool(self.operator(*self.levels)))
+
+        # new output time span
+        end = min(self.ends)
+        if end <= self.end:
+            return Signal()
 
-    return mod
+        # sweep input edges before new end, in time order. Simultaneous
+        # edges are processed together.
+        pending_a, pending_b = self.pending
+        level_a, level_b = self.levels
+        level = slevel = self.level
+        edges = []
+        inf = float('inf')
+        while True:
+            edge_a = pending_a[0] if pending_a and pending_a[0] < end else inf
+            edge_b = pending_b[0] if pending_b and pending_b[0] < end else inf
+            if edge_a <= edge_b:
+                if edge_a == inf:
+                    break
+                time = pending_a.popleft()
+                level_a ^= 1
+            if edge_b <= edge_a:
+                time = pending_b.popleft()
+                level_b ^= 1
+            if level != bool(self.operator(level_a,level_b)):
+                edges.append(time)
+                level ^= 1
+
+        # save sweep state
+        out = Signal(self.end,edges,end,slevel)
+        self.levels = [level_a,level_b]
+        self.level = level
+        self.end = end
 
+        return out
 
-def mod2code(mod,symbols,mask=None,origin=None,tscale=1.):
-    """ Demodulate a modulation signal in BTS format by maximal correlation
-    symbol estimation.
-    Return the demodulated code sequence (list of int), the corresponding
-    normalized correlation, list of float) of all symbols and the time where
-    the demodulation ends.
-    *symbols* is a list of signal objects, one for each coding symbol.
-    The symbols start time is assumed as phase difference with respect to the
-    signal start time.
-    *mask* is a signal objects.
-    Symbol correlation is computed only where mask = 1.
-    *origin* is the start time of the first coded symbol. If not defined, it
-    is set to start time of *mod*.
-    All symbols must have the same elapse time that is the symbol period.
-    The same holds for mask. """
 
-    # symbol period and phase
-    period = symbols[0].elapse()
-    phase = symbols[0].start
+class StreamBuffer:
+    """
+    Implements a stream buffer: a signal that grows by appending newer
+    signals and is kept within a maximum depth by discarding its older part,
+    as **Signal.stream** does. Edges are stored in a circular buffer, so
+    both append and discard take amortized constant time per edge.
+    The buffer depth is limited by time, *elapse* and *buf_step* as in
+    **Signal.stream**, or by the positive number of edges, *max_edges*, or
+    both.
+    If both are None, the buffer is unlimited. *capacity* is the initial
+    size of the circular buffer, it is doubled when full.
+    The buffer has the *start*, *end*, *slevel* and *tscale* attributes of
+    a signal, its edges are returned by **edges**.
+    """
 
-    # if origin not defined, set default value
-    if origin is None:
-        origin = mod.start
+    def __init__(self,elapse=None,buf_step=1.,max_edges=None,capacity=64):
 
-    # adjust origin with symbols phase
-    origin += phase
+        # buffer depth limits
+        self.elapse = elapse
+        self.buf_step = buf_step
+        self.max_edges = max_edges
+        # signal attributes, the void signal.
+        self.start = None
+        self.end = None
+        self.slevel = 0
+        self.tscale = 1.
+        # circular edge buffer: first edge position and number of edges
+        self._ring = [None] * max(1,capacity)
+        self._head = 0
+        self._count = 0
 
-    # chop signal, if last chop has no full period, discard it.
-    chops = mod.chop(period,origin)
-    if chops[-1].elapse() < period:
-        del chops[-1]
 
-    # for each symbol period
-    code = []
-    corr = []
-    corrs = []
-    for chop in chops:
-        chop.shift(phase-chop.start,inplace=True)
-        cor = []
-        # correlate each symbol with current period
-        if mask:
-            for symbol in symbols:
-                cor.append((chop^symbol&mask).integral(level=0,normalize=True))
-        else:
-            for symbol in symbols:
-                cor.append((chop ^ symbol).integral(level=0,normalize=True))
-        corrs.append(cor)
-        # search symbol with highest correlation
-        cors = zip(cor,range(len(symbols)))
-        cors.sort()
-        cor, cod = cors[-1]
-        code.append(cod)
-        corr.append(cor)
-        
-    return code,corr,corrs
+    def __len__(self):
+        """ Return the number of edges in the buffer. """
 
+        return self._count
 
-def bin2pwm(bincode,elapse_0,elapse_1,period,active=1,origin=0,tscale=1.):
-    """ Convert a binary code into a pulse width modulation signal in
-    BTS format. Return a Signal class object. *bincode* is a tuple or a
-    list of tuples: (*bit_length*, *bits*). *bit_length* is an integer
-    with the number of bits. *bits* is an integer or a long integer with
-    the binary code.  First bit is the LSB, last bit is the MSB.
-    *period* is the period of pwm pulses. *elapse_0* is the elapse time
-    of a pulse coding a 0 bit. *elapse_1*, the same for a 1 bit. *active*
-    is the active pulse level. *origin* is the time of the leading edge
-    of the first signal pulse. """
 
-    # to list single tuple
-    if type(bincode) != list:
-        bincode = [bincode]
+    def __nonzero__(self):
+        """ Return true if the buffer signal is not void. """
 
-    # set conventional start
-    start = origin
+        return not self.start is None
 
-    # convert a tuple at a time
-    edges = []
-    for bit_num, code in bincode:
-        # convert bit by bit of current tuple
-        end = bit_num * period + origin
-        t0 = origin
-        for i in range(bit_num):
+
+    def _edge(self,i):
+        """ Return the *i* th edge of the buffer. """
+
+        return self._ring[(self._head + i) % len(self._ring)]
+
+
+    def edges(self,first=0,last=None):
+        """ Return the list of buffer edges from position *first* to position
+        *last* excluded. If *last* is None, to the last edge. """
+
+        if last is None:
+            last = self._count
+        size = len(self._ring)
+        lo = (self._head + first) % size
+        hi = lo + last - first
+        if hi <= size:
+            return self._ring[lo:hi]
+        return self._ring[lo:] + self._ring[:hi - size]
+
+
+    def signal(self):
+        """ Return a copy of the buffer as a signal object. """
+
+        if not self:
+            return Signal()
+
+        return Signal(self.start,self.edges(),self.end,self.slevel,self.tscale)
+
+
+    def end_level(self):
+        """ Return the logic level at the end of the buffer signal. """
+
+        return self._count & 1 ^ self.slevel
+
+
+    def bisect(self,time):
+        """ Return the number of buffer edges before *time*. """
+
+        lo = 0
+        hi = self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._edge(mid) < time:
+                lo = mid + 1
+            else:
+                hi = mid
+
+        return lo
+
+
+    def window(self,t0,t1):
+        """ Return the part of the buffer from time *t0* to time *t1* as a
+        new signal object. See **Signal.window**. """
+
+        if not self:
+            return Signal()
+
+        start = max(self.start,t0)
+        end = min(self.end,t1)
+        if end <= start:
+            return Signal()
+
+        first = self.bisect(start)
+        if end < self.end:
+            last = self.bisect(end)
+        else:
+            last = self._count
+
+        return Signal(start,self.edges(first,last),end,
+            self.slevel ^ (first & 1),self.tscale)
+
+
+    def stream(self,other):
+        """ Append *other* signal to the buffer, then discard the older part
+        of the buffer exceeding its depth. The start time of *other* must be
+        equal to the buffer end time and its start level must be equal to the
+        buffer end level, as for **Signal.join**.
+        Return pattern **(** *discard, self* **)**: the discarded part, as a
+        signal object, and the buffer itself. """
+
+        self._append(other)
+
+        # discard by time: the elapse of discarded part is a integer multiple
+        # of buf_step, as in Signal.stream.
+        discard = Signal()
+        if not self.elapse is None and self.end - self.start > self.elapse:
+            shift = (int((self.end - self.start - self.elapse) / self.buf_step)
+                + 1) * self.buf_step
+            split = self.start + shift
+            if split >= self.end:
+                discard = self.signal()
+                self._clear()
+                return discard, self
+            discard = self._discard(self.bisect(split),split)
+
+        # discard by edges number: the newer part starts at its first edge.
+        if not self.max_edges is None and self._count > self.max_edges:
+            count = self._count - self.max_edges
+            discard = discard.join(self._discard(count,self._edge(count)))
+
+        return discard, self
+
+
+    def _append(self,other):
+        """ Append *other* signal to the buffer. """
+
+        # if other is void, no append.
+        if not other:
+            return
+
+        # if self is void, start from other.
+        if not self:
+            self.start = other.start
+            self.slevel = other.slevel
+            self.tscale = other.tscale
+        else:
+            # check for non overlap
+            assert self.end <= other.start, \
+                'self and other overlaps in time.\n' \
+                + 'self end = ' + repr(self.end) \
+                + ' , other start = ' + repr(other.start)
+            # check for same end-start level
+            assert self.end_level() == other.slevel, \
+                'self end level differ from other start level.\n' \
+                + 'self end level = ' + str(self.end_level()) \
+                + ' , other start level = ' + str(other.slevel)
+        self.end = other.end
+
+        # grow circular buffer, if required, doubling its size.
+        count = self._count + len(other)
+        size = len(self._ring)
+        if count > size:
+            while count > size:
+                size *= 2
+            self._ring = self.edges() + [None] * (size - self._count)
+            self._head = 0
+
+        # copy new edges, at most in two slices.
+        tail = (self._head + self._count) % size
+        first = min(len(other),size - tail)
+        self._ring[tail:tail + first] = other.edges[:first]
+        self._ring[0:len(other) - first] = other.edges[first:]
+        self._count = count
+
+
+    def _clear(self):
+        """ Make the buffer void. """
+
+        self.start = None
+        self.end = None
+        self._ring = [None] * len(self._ring)
+        self._head = 0
+        self._count = 0
+
+
+    def _discard(self,count,split):
+        """ Discard the first *count* edges of the buffer, moving its start
+        time to *split*. Return the discarded part as a signal object. """
+
+        discard = Signal(self.start,self.edges(0,count),split,self.slevel,
+            self.tscale)
+        size = len(self._ring)
+        for i in range(count):
+            self._ring[(self._head + i) % size] = None
+        self._head = (self._head + count) % size
+        self._count -= count
+        self.start = split
+        self.slevel ^= count & 1
+
+        return discard
+
+
+class Stream:
+    """
+    Implements a signal stream: a signal that grows in time, as new edges
+    are written into it or computed from other streams.
+    A source stream has no *inputs*: edges are written into its input
+    buffer by **write** and moved into its signal by **clock**, that
+    advances the signal end time. A dependent stream has a list of
+    controlling streams, *inputs*, and a *function* that computes its
+    signal from the input signals: called with one signal for each input,
+    all with the same time domain, it returns the output signal over the
+    same domain. At each **update**, *function* is called only over the
+    time span not yet computed, so it must be a pointwise function of
+    the inputs, as the logic operators are.
+    *start* and *slevel* are start time and start level of a source stream.
+    The stream signal is kept into *buffer*, a **StreamBuffer**: *elapse*
+    and *buf_step* limit its time depth, *max_edges* limits its number of
+    edges. If *elapse* and *max_edges* are None, the buffer is unlimited.
+    """
+
+    def __init__(self,function=None,inputs=(),start=0,slevel=0,elapse=None,
+            buf_step=1.,max_edges=None,tscale=1.):
+
+        # stream signal buffer
+        self.buffer = StreamBuffer(elapse,buf_step,max_edges)
+        # source stream start and input buffer of not yet clocked edges
+        self.start = start
+        self.slevel = slevel
+        self.tscale = tscale
+        self.inbuf = []
+        # end time and end level of the emitted signal, kept also when the
+        # buffer discards all of it.
+        self.end = None
+        self.level = slevel
+        # controlling and depending streams
+        self.function = function
+        self.controlling = list(inputs)
+        self.depending = []
+        for stream in self.controlling:
+            stream.depending.append(self)
+
+
+    def write(self,edges):
+        """ Write the edge time or the list of ascending edge times *edges*
+        into the input buffer of a source stream. Edges become part of the
+        stream signal when the stream is clocked. Edges must be after the
+        buffered ones and after the clocked end time, or not before the
+        stream start, otherwise ValueError is raised and no edge is
+        written. """
+
+        if not type(edges) in (list,tuple):
+            edges = [edges]
+
+        # edges must follow buffered edges and the clocked signal.
+        for i, edge in enumerate(edges):
+            if i:
+                last = edges[i - 1]
+            elif self.inbuf:
+                last = self.inbuf[-1]
+            else:
+                last = self.end
+            if (last is None and edge < self.start) or \
+                    (not last is None and edge <= last):
+                raise ValueError('stream edges times must be ascending and'
+                    + ' after the clocked end time.'
+                    + '\n  found edge time: %s' % repr(edge)
+                    + '\n  previous time: %s' %
+                        repr(self.start if last is None else last))
+
+        self.inbuf.extend(edges)
+
+
+    def clock(self,now):
+        """ Advance the end time of a source stream to *now*, moving the
+        buffered edges up to *now* into the stream signal. Return the newly
+        added signal part, the void signal if *now* is not after the stream
+        end time. """
+
+        # nothing to do if time does not advance
+        start = self.start if self.end is None else self.end
+        if now <= start:
+            return Signal()
+
+        # move buffered edges up to now into a new signal part
+        pos = bisect.bisect_right(self.inbuf,now)
+        new = Signal(start,self.inbuf[:pos],now,self.level,self.tscale)
+        del self.inbuf[:pos]
+
+        self._emit(new)
+
+        return new
+
+
+    def update(self):
+        """ Recompute a dependent stream from its controlling streams over
+        the time span between its end time and the earliest end time of its
+        controlling streams. Return the newly computed signal part, the void
+        signal if there is no new time span. """
+
+        # void controlling streams, nothing to do.
+        if not self.controlling or \
+                None in [stream.end for stream in self.controlling]:
+            return Signal()
+
+        # new time span
+        end = min([stream.end for stream in self.controlling])
+        if not self.end is None:
+            start = self.end
+        elif all([stream.buffer for stream in self.controlling]):
+            start = max([stream.buffer.start for stream in self.controlling])
+        else:
+            return Signal()
+        if end <= start:
+            return Signal()
+
+        # compute output over new time span
+        new = self._compute(start,end)
+        if new:
+            self._emit(new)
+
+        return new
+
+
+    def signal(self):
+        """ Return a copy of the stream signal kept into the buffer. """
+
+        return self.buffer.signal()
+
+
+    def value(self):
+        """ Return the present value of the stream: the level at its end
+        time. If the stream is void, return none. """
+
+        if self.end is None:
+            return None
+
+        return self.level
+
+
+    def _compute(self,start,end):
+        """ Return the output signal over the time span from *start* to
+        *end*, computed by the stream function from the input signals. """
+
+        inputs = [stream.buffer.window(start,end)
+            for stream in self.controlling]
+
+        return self.function(*inputs)
+
+
+    def _emit(self,new):
+        """ Stream *new* signal part into the buffer and keep its end time
+        and end level. """
+
+        self.buffer.stream(new)
+        self.end = new.end
+        self.level = new.end_level()
+
+
+class Connector(Stream):
+    """
+    A stream tap: a dependent stream that reproduces its input stream
+    *source* delayed by *delay*. For the other arguments see **Stream**.
+    """
+
+    def __init__(self,source,delay=0,elapse=None,buf_step=1.):
+
+        Stream.__init__(self,None,[source],elapse=elapse,buf_step=buf_step)
+        self.delay = delay
+
+
+    def update(self):
+        """ Recompute the connector output up to the input end time plus
+        delay. Return the newly computed signal part. """
+
+        source = self.controlling[0]
+        if source.end is None:
+            return Signal()
+
+        # new time span, in output time
+        end = source.end + self.delay
+        if not self.end is None:
+            start = self.end
+        elif source.buffer:
+            start = source.buffer.start + self.delay
+        else:
+            return Signal()
+        if end <= start:
+            return Signal()
+
+        new = self._compute(start,end)
+        if new:
+            self._emit(new)
+
+        return new
+
+
+    def _compute(self,start,end):
+        """ Return the input signal from *start* - delay to *end* - delay
+        shifted by delay. """
+
+        new = self.controlling[0].buffer.window(start - self.delay,
+            end - self.delay)
+        if not new:
+            return new
+        new.shift(self.delay,inplace=True)
+        new.start = start
+        new.end = end
+
+        return new
+
+
+class StreamGroup:
+    """
+    A group of streams clocked and updated together. *streams* is a
+    list of streams. On each **clock**, the source streams of the group are
+    clocked, then the dependent streams triggered by a change of their
+    controlling streams are updated in topological order.
+    """
+
+    def __init__(self,streams=()):
+
+        self.streams = []
+        self._order = None
+        for stream in streams:
+            self.add(stream)
+
+
+    def add(self,stream):
+        """ Add *stream* to the group. """
+
+        self.streams.append(stream)
+        self._order = None
+
+
+    def order(self):
+        """ Return the group streams in topological order: each stream
+        comes after all its controlling streams in the group. If streams have
+        a circular dependency, raise ValueError. """
+
+        if self._order is None:
+            members = set(self.streams)
+            pending = dict([(stream,len([s for s in stream.controlling
+                if s in members])) for stream in self.streams])
+            ready = [stream for stream in self.streams if not pending[stream]]
+            order = []
+            while ready:
+                stream = ready.pop(0)
+                order.append(stream)
+                for dependent in stream.depending:
+                    if dependent in pending:
+                        pending[dependent] -= 1
+                        if not pending[dependent]:
+                            ready.append(dependent)
+            if len(order) < len(self.streams):
+                raise ValueError('streams have a circular dependency.')
+            self._order = order
+
+        return self._order
+
+
+    def clock(self,now):
+        """ Clock all source streams of the group at time *now*, then update
+        the dependent streams whose controlling streams changed. Return the
+        list of streams that changed. """
+
+        # streams to be updated: triggered by changes in controlling streams
+        to_be_updated = set()
+        changed = []
+        for stream in self.order():
+            if not stream.controlling:
+                new = stream.clock(now)
+            elif stream in to_be_updated:
+                new = stream.update()
+            else:
+                continue
+            if new:
+                changed.append(stream)
+                to_be_updated.update(stream.depending)
+
+        return changed
+
+
+class SerialReceiver:
+    """
+    Implements a resumable serial asynchronous receiving interface.
+    The serial line signal is given in time contiguous chunks to **feed**,
+    that returns the characters completed so far. The frame state is kept
+    between chunks, so a character straddling two chunks is received as
+    if the whole signal were given to **serial_rx**. Only the edges after
+    the last sampling time are kept, memory does not grow with the
+    capture length. For the keyword arguments see **serial_tx**.
+    """
+
+    def __init__(self,char_bits=8,parity='off',stop_bits=2,baud=50):
+
+        # serial parameters
+        self.char_bits = char_bits
+        self.parity = parity
+        self.stop_bits = stop_bits
+        self.baud = baud
+        # line: edges after last sampling time, level before them, end time.
+        self.edges = collections.deque()
+        self.level = 0
+        self.end = None
+        # frame state: phase, char start time, next sampling time, bits to
+        # be sampled in current phase, received char and its status.
+        self.phase = 'idle'
+        self.start = None
+        self.sample = -float('inf')
+        self.count = 0
+        self.char = 0
+        self.status = 0
+
+
+    def feed(self,sline):
+        """ Receive the serial line signal chunk *sline*. It must start at
+        the end time of the previous chunk, with the same level.
+        Return the received characters completed so far, as **serial_rx**:
+        a list of chars, a list of their start times and a list of their
+        status. """
+
+        chars = []
+        timings = []
+        status = []
+
+        # append chunk
+        if not sline:
+            return chars, timings, status
+        if self.end is None:
+            self.level = sline.slevel
+        else:
+            assert self.end == sline.start, \
+                'line end differ from chunk start.\n' \
+                + 'line end = ' + repr(self.end) \
+                + ' , chunk start = ' + repr(sline.start)
+        self.edges.extend(sline.edges)
+        self.end = sline.end
+        bit_time = float(sline.tscale) / self.baud
+        char_mask = 1 << self.char_bits - 1
+
+        # consume all line edges until the next sampling is beyond line end.
+        while True:
+
+            # wait for the first edge after last sampling time: start bit.
+            if self.phase == 'idle':
+                self._sample(self.sample)
+                if not self.edges:
+                    break
+                self.start = self.edges[0]
+                self.phase = 'start'
+                self.sample = self.start + bit_time / 2.
+
+            # if sampling time is beyond line end, wait next chunk.
+            if self.sample > self.end:
+                break
+            level = self._sample(self.sample)
+
+            # sample start bit. If it is 0, character start is aborted.
+            if self.phase == 'start':
+                if not level:
+                    self.phase = 'idle'
+                    continue
+                self.phase = 'char'
+                self.count = self.char_bits
+                self.char = 0
+                self.status = 0
+
+            # sample a char, char bits wide: LSB first.
+            elif self.phase == 'char':
+                self.char >>= 1
+                if not level:
+                    self.char |= char_mask
+                self.count -= 1
+                if not self.count:
+                    if self.parity != 'off':
+                        self.phase = 'parity'
+                    else:
+                        self.phase = 'stop'
+                        self.count = self.stop_bits
+
+            # sample and check parity
+            elif self.phase == 'parity':
+                ones = _ones(self.char) & 1
+                if self.parity == 'odd':
+                    ones = ones ^ 1
+                if level == ones:
+                    self.status |= PARITY_ERROR
+                self.phase = 'stop'
+                self.count = self.stop_bits
+
+            # sample stop bit(s), if level at stop sampling is 1, set error.
+            # At stop bits end, the char is complete.
+            elif self.phase == 'stop':
+                if level:
+                    self.status |= STOP_ERROR
+                self.count -= 1
+                if not self.count:
+                    chars.append(chr(self.char))
+                    timings.append(self.start)
+                    status.append(self.status)
+                    self.start = self.sample + 0.5 * bit_time
+                    self.phase = 'start'
+                    self.sample = self.start + bit_time / 2.
+                    continue
+
+            self.sample += bit_time
+
+        return chars, timings, status
+
+
+    def close(self):
+        """ Terminate the reception at the line end. A character not yet
+        complete is returned with the end of signal status of **serial_rx**.
+        Return a list of chars, a list of their start times and a list of
+        their status. The receiver is reset. """
+
+        chars = []
+        timings = []
+        status = []
+
+        # complete the char being received, as serial_rx does at signal end.
+        if self.phase in ('char','parity','stop'):
+            if self.phase == 'char':
+                for j in range(self.count):
+                    self.char >>= 1
+                    self.char |= 1 << self.char_bits - 1
+                self.status |= EOS_CHAR
+            elif self.phase == 'parity':
+                self.status |= EOS_PARITY
+            else:
+                self.status |= EOS_STOP
+            chars.append(chr(self.char))
+            timings.append(self.start)
+            status.append(self.status)
+
+        self.__init__(self.char_bits,self.parity,self.stop_bits,self.baud)
+
+        return chars, timings, status
+
+
+    def _sample(self,time):
+        """ Return the line level at *time*, discarding edges before it. """
+
+        edges = self.edges
+        while edges and edges[0] < time:
+            edges.popleft()
+            self.level ^= 1
+
+        return self.level
+
+
+class PhaseTracker:
+    """
+    Implements a streaming phase tracker of a signal against a periodic
+    reference. The reference is *model*, one period of the reference signal,
+    repeated with period *period*: it must have the same start and end
+    levels and its edges must be before its end time. Each signal chunk
+    given to **feed** is correlated with the reference only for shifts
+    within *span* around the last phase estimate, with step *resolution*,
+    so each update costs O(new edges). The phase estimate follows the
+    correlation maximum through a first order loop with gain *gain*
+    (0 < *gain* <= 1, 1 = no filtering), PLL-style.
+    *phase* is the initial phase estimate. If None, the first chunk is
+    correlated over a whole period.
+    The phase is the time shift of the reference, the reference at time t
+    is the model at time t - phase.
+    """
+
+    def __init__(self,model,period,span,resolution,phase=None,gain=1.):
+
+        assert model.slevel == model.end_level(), \
+            'model start level differ from model end level.'
+        self.model = model
+        self.period = period
+        self.span = span
+        self.resolution = resolution
+        self.phase = phase
+        self.gain = gain
+        # output time series
+        self.times = []
+        self.phases = []
+        self.qualities = []
+
+
+    def feed(self,signal):
+        """ Update the phase estimate with the signal chunk *signal*.
+        Return pattern **(** *time, phase, quality* **)**
+
+          **time**: float, the chunk end time.
+
+          **phase**: float, the updated phase estimate.
+
+          **quality**: float, the normalized correlation at the correlation
+          maximum, from -1 to +1, 1 when chunk and reference are equal.
+
+        The same values are appended to the *times*, *phases* and
+        *qualities* lists of the tracker. If *signal* is void, return none. """
+
+        if not signal:
+            return None
+
+        # shifts to be tried: a whole period at acquisition, then a span
+        # around the last phase estimate.
+        if self.phase is None:
+            center = self.period * 0.5
+            span = self.period * 0.5
+        else:
+            center = self.phase
+            span = self.span
+        steps = int(span / self.resolution)
+
+        # correlation of chunk with the shifted reference, take max.
+        best = None
+        for step in range(-steps,steps + 1):
+            shift = center + step * self.resolution
+            reference = self.reference(shift,signal.start,signal.end)
+            corr = (signal ^ reference).integral(0,normalize=True) * 2 - 1
+            if best is None or corr > best[0]:
+                best = (corr,shift)
+        quality, shift = best
+
+        # first order loop update
+        if self.phase is None:
+            self.phase = shift
+        else:
+            self.phase += self.gain * (shift - self.phase)
+
+        self.times.append(signal.end)
+        self.phases.append(self.phase)
+        self.qualities.append(quality)
+
+        return signal.end, self.phase, quality
+
+
+    def reference(self,phase,start,end):
+        """ Return the reference signal with phase *phase* from time *start*
+        to time *end*. """
+
+        model = self.model
+        first = int(math.floor((start - phase - model.start) / self.period))
+        edges = []
+        slevel = model.slevel
+        origin = model.start + phase + first * self.period
+        while origin < end:
+            for edge in model.edges:
+                time = origin + edge - model.start
+                if time < start:
+                    slevel ^= 1
+                elif time < end:
+                    edges.append(time)
+            origin += self.period
+
+        return Signal(start,edges,end,slevel)
+
+
+class EdgeServer:
+    """
+    Implements an edge ingestion server: it reads batched binary timestamp
+    frames from sockets and streams them, as signals, into a stream buffer.
+    A frame is the number of its edges, as little endian unsigned 32 bit
+    integer, followed by the edge times, as little endian 64 bit floats,
+    see **pack_frame**. A frame is decoded as a whole, without per edge
+    conversions.
+    Datagram sockets (UDP, Unix datagram) carry whole frames, one or more
+    for each datagram. Stream sockets (TCP, Unix stream) carry a sequence
+    of frames, listening stream sockets accept new connections.
+    *buffer* is the **StreamBuffer** fed with the received edges, if None
+    an unlimited one is created. *start* and *slevel* are the start time
+    and the start level of the received signal.
+    Back-pressure: while *max_pending* or more received edges are not yet
+    streamed into the buffer, sockets are not read, so stream senders
+    block on full sockets and datagrams are dropped by the kernel.
+    Frames with edges not strictly ascending, not after the last received
+    edge or before the last flush end are dropped and counted into
+    *errors*, as frames with a wrong length are.
+    """
+
+    def __init__(self,buffer=None,start=0.,slevel=0,max_pending=65536):
+
+        if buffer is None:
+            buffer = StreamBuffer()
+        self.buffer = buffer
+        self.max_pending = max_pending
+        self.errors = 0
+        # received edges not yet streamed, as a queue of frame arrays
+        self.pending = collections.deque()
+        self.pending_edges = 0
+        # end time and end level of the streamed signal, last edge time.
+        self.end = float(start)
+        self.level = slevel
+        self._last = self.end
+        # read sockets with their partial frame data
+        self._sockets = {}
+
+
+    def add(self,sock):
+        """ Add *sock* to the sockets read by the server. """
+
+        sock.setblocking(0)
+        self._sockets[sock] = ''
+
+
+    def remove(self,sock):
+        """ Remove *sock* from the sockets read by the server. """
+
+        del self._sockets[sock]
+
+
+    def poll(self,timeout=0.):
+        """ Wait at most *timeout* seconds for sockets ready to read. Read
+        them and decode their whole frames into pending edges. Stream
+        sockets closed by the sender are removed and closed.
+        Return the number of received edges. """
+
+        # back-pressure: do not read, if too many pending edges.
+        if self.pending_edges >= self.max_pending or not self._sockets:
+            return 0
+
+        received = 0
+        ready = select.select(list(self._sockets),[],[],timeout)[0]
+        for sock in ready:
+            if self.pending_edges >= self.max_pending:
+                break
+            # listening socket: add the new connection.
+            if sock.type == socket.SOCK_STREAM and \
+                    sock.getsockopt(socket.SOL_SOCKET,socket.SO_ACCEPTCONN):
+                try:
+                    self.add(sock.accept()[0])
+                except socket.error:
+                    pass
+                continue
+            try:
+                data = sock.recv(65536)
+            except socket.error:
+                continue
+            # datagram: whole frames only.
+            if sock.type == socket.SOCK_DGRAM:
+                size, rest = self._decode(data)
+                received += size
+                if rest:
+                    self.errors += 1
+            # stream: keep partial frame for next read.
+            elif data:
+                size, self._sockets[sock] = \
+                    self._decode(self._sockets[sock] + data)
+                received += size
+            else:
+                self.remove(sock)
+                sock.close()
+
+        return received
+
+
+    def flush(self,end=None):
+        """ Stream the pending edges before *end* into the buffer, as a
+        signal from the previous flush end to *end*, the others are kept
+        pending. If *end* is None, all pending edges are streamed and the
+        signal ends at the last one.
+        If *end* is not after the previous flush end, nothing is streamed.
+        Return the result of **StreamBuffer.stream**:
+        **(** *discard, buffer* **)**. """
+
+        whole = end is None
+        if whole:
+            end = self._last
+        if end <= self.end:
+            return Signal(), self.buffer
+
+        # take whole frames before end, split the frame across it.
+        edges = []
+        frames = 0
+        rest = None
+        for frame in self.pending:
+            if whole or frame[-1] < end:
+                edges.extend(frame)
+                frames += 1
+                continue
+            if frame[0] < end:
+                split = bisect.bisect_left(frame,end)
+                edges.extend(frame[:split])
+                rest = frame[split:]
+            break
+        signal = Signal(self.end,edges,end,self.level,self.buffer.tscale)
+
+        # signal is valid: remove its edges from pending ones.
+        for i in range(frames):
+            self.pending.popleft()
+        if not rest is None:
+            self.pending[0] = rest
+        self.pending_edges -= len(edges)
+        self.end = signal.end
+        self.level = signal.end_level()
+
+        return self.buffer.stream(signal)
+
+
+    def _decode(self,data):
+        """ Decode the whole frames at the beginning of *data* into pending
+        edges. Return pattern **(** *edges, rest* **)**: the number of
+        decoded edges and the undecoded data. """
+
+        decoded = 0
+        pos = 0
+        while len(data) - pos >= 4:
+            count = struct.unpack_from('<I',data,pos)[0]
+            size = 4 + 8 * count
+            if len(data) - pos < size:
+                break
+            frame = array.array('d')
+            frame.fromstring(data[pos + 4:pos + size])
+            if sys.byteorder == 'big':
+                frame.byteswap()
+            pos += size
+            if not count:
+                continue
+            # drop out of order frames: edges must be strictly ascending
+            # after the last received edge and from the streamed end.
+            if frame[0] <= self._last or frame[0] < self.end or \
+                    not all(itertools.imap(operator.lt,frame,
+                    itertools.islice(frame,1,None))):
+                self.errors += 1
+                continue
+            self._last = frame[-1]
+            self.pending.append(frame)
+            self.pending_edges += count
+            decoded += count
+
+        return decoded, data[pos:]
+
+
+class CounterUnwrapper:
+    """
+    Implements the unwrapping of raw hardware timestamps, given as the
+    values of a *bits* wide tick counter that wraps to zero. The counter
+    values are given in chunks to **feed**, that returns the signal chunk
+    with their edges. A value lower than the previous one is a counter
+    rollover, so at most one rollover is allowed between two consecutive
+    values. The rollover count is kept between chunks.
+    *tscale* is the number of ticks in a second, as the signal time scale
+    is the number of time units in a second. If *seconds* is false, edge
+    times are integer ticks and *tscale* is the signal time scale,
+    otherwise edge times are float seconds. *start* and *slevel* are the
+    start time and the start level of the signal, if *start* is None the
+    signal starts at the first edge.
+    Requires Numpy.
+    """
+
+    def __init__(self,bits=32,tscale=1.,seconds=False,start=None,slevel=0):
+
+        # counter parameters
+        self.bits = bits
+        self.tscale = tscale
+        self.seconds = seconds
+        # carried state: last counter value, rollovers so far.
+        self.last = None
+        self.rollovers = 0
+        # end time and end level of the signal
+        self.end = start
+        self.level = slevel
+        self._pending = []
+
+
+    def feed(self,counts):
+        """ Unwrap the counter values *counts*, a sequence or an array of
+        integers. Return the signal chunk from the end of the previous chunk
+        to the last edge, as a signal object. If no values, return a void
+        signal. """
+
+        import numpy as np
+
+        counts = np.asarray(counts,dtype=np.int64)
+        if not len(counts):
+            return Signal()
+
+        # a decreasing value is a rollover
+        if self.last is None:
+            steps = np.diff(counts)
+        else:
+            steps = np.diff(counts,prepend=self.last)
+        rollovers = np.cumsum(steps < 0)
+        if len(counts) > len(rollovers):
+            rollovers = np.concatenate(([0],rollovers))
+        rollovers += self.rollovers
+        ticks = counts + (rollovers << self.bits)
+        self.last = counts[-1]
+        self.rollovers = rollovers[-1]
+
+        # edge times and signal time scale
+        if self.seconds:
+            edges = (ticks / float(self.tscale)).tolist()
+            tscale = 1.
+        else:
+            edges = ticks.tolist()
+            tscale = self.tscale
+
+        # an edge at signal start waits for a later edge
+        if self.end is None:
+            self.end = edges[0]
+        edges = self._pending + edges
+        if edges[-1] == self.end:
+            self._pending = edges
+            return Signal()
+        self._pending = []
+        chunk = Signal(self.end,edges,edges[-1],self.level,tscale)
+        self.end = chunk.end
+        self.level = chunk.end_level()
+
+        return chunk
+
+
+class SignalStore:
+    """
+    Implements an on-disk store of multi-channel signals, for long
+    recordings and fast random access by time.
+    The store is the directory *path*, created if missing. Each channel is
+    a bts file, see **load**, with the channel name and *.bts* extension,
+    and a sparse index file with *.idx* extension. Channels grow by
+    **append**, that writes only the new edges and the file header. Every
+    *chunk_edges* edges a new time chunk is started, also inside a single
+    append, and its start time, the offset of its first edge and its start
+    level are added to the index. **read** bisects the index and reads from
+    disk only the chunks inside the requested time window.
+    Requires Numpy.
+    """
+
+    # index record: chunk start time, first edge offset, start level.
+    _record = struct.Struct('<dQB')
+
+    def __init__(self,path,chunk_edges=4096):
+
+        self.path = path
+        self.chunk_edges = chunk_edges
+        if not os.path.isdir(path):
+            os.makedirs(path)
+        # channel index cache: chunk start times, offsets and levels.
+        self._index = {}
+
+
+    def channels(self):
+        """ Return the sorted list of the channel names. """
+
+        return sorted([name[:-4] for name in os.listdir(self.path)
+            if name.endswith('.bts')])
+
+
+    def append(self,channel,signal):
+        """ Append *signal* to *channel*, creating it if missing. The start
+        time of *signal* must be greater or equal to the channel end time and
+        its start level must be equal to the channel end level, as for
+        **Signal.join**. """
+
+        import numpy as np
+
+        # if signal is void, no append.
+        if not signal:
+            return
+
+        bts = self._filename(channel,'.bts')
+
+        # new channel: save signal, its first chunk.
+        if not os.path.exists(bts):
+            signal.save(bts)
+            count = 0
+            level = signal.slevel
+            self._add_chunks(channel,[(signal.start,0,level)])
+        else:
+            flags, start, end, tscale, count = _bts_header(bts)
+            level = int(bool(flags & _BTS_SLEVEL)) ^ (count & 1)
+            assert end <= signal.start, \
+                'channel and signal overlaps in time.\n' \
+                + 'channel end = ' + repr(end) \
+                + ' , signal start = ' + repr(signal.start)
+            assert level == signal.slevel, \
+                'channel end level differ from signal start level.\n' \
+                + 'channel end level = ' + str(level) \
+                + ' , signal start level = ' + str(signal.slevel)
+
+            # edge and end times must have the channel types.
+            if signal.edges and \
+                    (type(signal.edges[0]) == float) != \
+                    bool(flags & _BTS_FLOAT_EDGES):
+                raise TypeError('signal edge type differ from channel one.'
+                    + '\n  channel edge type: %s' %
+                        (flags & _BTS_FLOAT_EDGES and float or int)
+                    + '\n  found edge type: %s' % type(signal.edges[0]))
+            if (type(signal.end) == float) != bool(flags & _BTS_FLOAT_END):
+                raise TypeError('signal end type differ from channel one.'
+                    + '\n  channel end type: %s' %
+                        (flags & _BTS_FLOAT_END and float or int)
+                    + '\n  found end type: %s' % type(signal.end))
+
+            # write new edges, then update header.
+            with open(bts,'r+b') as f:
+                f.seek(_BTS_HEADER.size + 8 * count)
+                np.asarray(signal.edges,dtype=_bts_dtype(flags)).tofile(f)
+                f.seek(0)
+                f.write(_bts_pack_header(flags,start,signal.end,tscale,
+                    count + len(signal)))
+
+        # start a new chunk every chunk_edges edges: at the append start, if
+        # enough edges into the last chunk, and inside the new edges, at the
+        # edge time with the level before it.
+        times, offsets, levels = self._read_index(channel)
+        chunks = []
+        pos = offsets[-1] + self.chunk_edges
+        if pos <= count:
+            chunks.append((signal.start,count,level))
+            pos = count + self.chunk_edges
+        while pos < count + len(signal):
+            chunks.append((signal.edges[pos - count],pos,
+                level ^ ((pos - count) & 1)))
+            pos += self.chunk_edges
+        self._add_chunks(channel,chunks)
+
+
+    def read(self,channel,t0=None,t1=None):
+        """ Return the part of *channel* from time *t0* to time *t1*, as
+        **Signal.window** does, as a new signal object. If *t0* or *t1* are
+        None, from channel start or to channel end. """
+
+        import numpy as np
+
+        bts = self._filename(channel,'.bts')
+        flags, start, end, tscale, count = _bts_header(bts)
+        if flags & _BTS_VOID:
+            return Signal()
+        if t0 is None or t0 < start:
+            t0 = start
+        if t1 is None or t1 > end:
+            t1 = end
+        if t1 <= t0:
+            return Signal()
+
+        # chunks: the last one starting before t0 up to the last one starting
+        # before t1.
+        times, offsets, levels = self._read_index(channel)
+        first = max(bisect.bisect_left(times,t0) - 1,0)
+        last = bisect.bisect_left(times,t1)
+        if last < len(offsets) and t1 < end:
+            stop = offsets[last]
+        else:
+            stop = count
+        with open(bts,'rb') as f:
+            f.seek(_BTS_HEADER.size + 8 * offsets[first])
+            edges = np.fromfile(f,dtype=_bts_dtype(flags),
+                count=stop - offsets[first])
+
+        # window edges
+        start_pos = int(np.searchsorted(edges,t0,side='left'))
+        if t1 < end:
+            end_pos = int(np.searchsorted(edges,t1,side='left'))
+        else:
+            end_pos = len(edges)
+
+        return Signal(t0,edges[start_pos:end_pos].tolist(),t1,
+            levels[first] ^ (start_pos & 1),tscale)
+
+
+    def _filename(self,channel,extension):
+        """ Return the file name of *channel* with *extension*. """
+
+        return os.path.join(self.path,channel + extension)
+
+
+    def _read_index(self,channel):
+        """ Return the index of *channel*, from cache or from its file.
+        Return pattern **(** *times, offsets, levels* **)**. """
+
+        if not channel in self._index:
+            times, offsets, levels = [], [], []
+            with open(self._filename(channel,'.idx'),'rb') as f:
+                data = f.read()
+            size = self._record.size
+            for pos in range(0,len(data) - size + 1,size):
+                time, offset, level = self._record.unpack_from(data,pos)
+                times.append(time)
+                offsets.append(offset)
+                levels.append(level)
+            self._index[channel] = times, offsets, levels
+
+        return self._index[channel]
+
+
+    def _add_chunks(self,channel,chunks):
+        """ Add *chunks* to the index of *channel*. Each chunk is a tuple
+        **(** *time, offset, level* **)**: its start time, the offset of its
+        first edge and its start level. """
+
+        if not chunks:
+            return
+        with open(self._filename(channel,'.idx'),'ab') as f:
+            f.write(''.join([self._record.pack(*chunk) for chunk in chunks]))
+        if channel in self._index:
+            times, offsets, levels = self._index[channel]
+            for time, offset, level in chunks:
+                times.append(time)
+                offsets.append(offset)
+                levels.append(level)
+
+
+class SerialLink:
+    """
+    A serial line trial for the bit error rate engine **ber**. Each call
+    transmits a random message of *chars* characters with **serial_tx**,
+    adds a gaussian jitter with standard deviation *jitter*, xors the line
+    with **noise** pulses, if *noise* is a dict of **noise** keyword
+    arguments, and receives the line with **serial_rx**.
+    For *char_bits*, *parity*, *stop_bits*, *baud* see **serial_tx**.
+    *gap* is the mean idle time between characters, in bit times.
+    """
+
+    def __init__(self,chars=16,char_bits=8,parity='off',stop_bits=2,baud=50,
+            gap=2.,jitter=0.,noise=None):
+
+        self.chars = chars
+        self.char_bits = char_bits
+        self.parity = parity
+        self.stop_bits = stop_bits
+        self.baud = baud
+        self.gap = gap
+        self.jitter = jitter
+        self.noise = noise
+
+
+    def __call__(self,rand):
+        """ Run one trial with the numpy random generator *rand*. Return
+        the counts **(** *chars, char_errors, bits, bit_errors* **)**. """
+
+        # random message and timings
+        bit_time = 1. / self.baud
+        frame_time = (self.char_bits + (self.parity != 'off') + 1
+            + self.stop_bits) * bit_time
+        codes = rand.randint(0,2**self.char_bits,self.chars)
+        gaps = rand.exponential(self.gap * bit_time,self.chars)
+        times = (gaps + frame_time).cumsum().tolist()
+        chars_in = [chr(code) for code in codes]
+
+        # encode and impair
+        sline = serial_tx(chars_in,times,self.char_bits,self.parity,
+            self.stop_bits,self.baud)
+        if self.jitter:
+            sline.jitter(self.jitter,seed=rand)
+        if self.noise:
+            kargs = {'active':1}
+            kargs.update(self.noise)
+            sline = sline ^ noise(sline.start,sline.start,sline.end,**kargs)
+
+        # decode and count errors: a char is wrong if its value differs or
+        # its status is not ok, a missing or extra char is wrong too.
+        # Received chars are matched to transmitted ones by start time:
+        # the nearest one within half a frame time, so a missing or extra
+        # char does not shift the following ones.
+        chars_out, timings, status = serial_rx(sline,self.char_bits,
+            self.parity,self.stop_bits,self.baud)
+        tolerance = frame_time * 0.5
+        char_errors = 0
+        bit_errors = 0
+        matched = 0
+        for char_in, char_time in zip(chars_in,times):
+            lo = bisect.bisect_left(timings,char_time - tolerance)
+            hi = bisect.bisect_left(timings,char_time + tolerance,lo)
+            if lo == hi:
+                char_errors += 1
+                bit_errors += self.char_bits
+                continue
+            j = min(range(lo,hi),key=lambda j: abs(timings[j] - char_time))
+            matched += 1
+            diff = ord(char_in) ^ ord(chars_out[j])
+            if diff or status[j]:
+                char_errors += 1
+            bit_errors += _ones(diff)
+        extra = len(chars_out) - matched
+        char_errors += extra
+        bit_errors += extra * self.char_bits
+
+        return self.chars, char_errors, self.chars * self.char_bits, bit_errors
+
+
+class PwmLink:
+    """
+    A pulse width modulation trial for the bit error rate engine **ber**.
+    Each call encodes *words* random words of *word_bits* bits with
+    **bin2pwm**, adds a gaussian jitter with standard deviation *jitter*,
+    xors the signal with **noise** pulses, if *noise* is a dict of **noise**
+    keyword arguments, and decodes it by correlation with **pwm2bin**.
+    Words are counted as characters.
+    For *elapse_0*, *elapse_1*, *period*, *active* see **bin2pwm**.
+    """
+
+    def __init__(self,words=4,word_bits=8,elapse_0=1.,elapse_1=2.,period=4.,
+            active=1,jitter=0.,noise=None):
+
+        self.words = words
+        self.word_bits = word_bits
+        self.elapse_0 = elapse_0
+        self.elapse_1 = elapse_1
+        self.period = period
+        self.active = active
+        self.jitter = jitter
+        self.noise = noise
+
+
+    def __call__(self,rand):
+        """ Run one trial with the numpy random generator *rand*. Return
+        the counts **(** *chars, char_errors, bits, bit_errors* **)**. """
+
+        # random words, first word is the least significant one.
+        words_in = [int(w) for w in
+            rand.randint(0,2**self.word_bits,self.words)]
+        bincode = [(self.word_bits,word) for word in words_in]
+
+        # encode and impair
+        pwm = bin2pwm(bincode,self.elapse_0,self.elapse_1,self.period,
+            self.active,origin=0.)
+        if self.jitter:
+            pwm.jitter(self.jitter,seed=rand)
+        if self.noise:
+            kargs = {'active':1}
+            kargs.update(self.noise)
+            pwm = pwm ^ noise(pwm.start,pwm.start,pwm.end,**kargs)
+
+        # decode: missing bits are counted as errors.
+        (bit_num, code), error = pwm2bin(pwm,self.elapse_0,self.elapse_1,
+            self.period,self.active)
+        bits = self.words * self.word_bits
+        mask = 2**self.word_bits - 1
+        char_errors = 0
+        bit_errors = 0
+        for i, word in enumerate(words_in):
+            if i * self.word_bits < bit_num:
+                diff = ((word ^ code) | error) & mask
+            else:
+                diff = mask
+            if diff:
+                char_errors += 1
+            bit_errors += _ones(diff)
+            code >>= self.word_bits
+            error >>= self.word_bits
+
+        return self.words, char_errors, bits, bit_errors
+
+
+#### functions
+
+def code2mod(code,symbols,origin=0,tscale=1.):
+    """ Modulate a code sequence into a modulation signal in BTS format.
+    For each number in code, the symbol in symbols with index equal to number is
+    appended to the modulation signal. 
+    Return a Signal class object.
+    *code* is list of integer.
+    *symbols* is a list of signal objects, one for each coding symbol.
+    *origin* is the start time of the first coded symbol. """
+
+    # modulate all code items
+    mod = symbols[code[0]].shift(origin)
+    for number in code[1:]:
+        symbol = symbols[number]
+        mod.join(symbol.shift(mod.end-symbol.start),inplace=True)
+
+    return mod
+
+
+def mod2code(mod,symbols,mask=None,origin=None,tscale=1.):
+    """ Demodulate a modulation signal in BTS format by maximal correlation
+    symbol estimation.
+    Return the demodulated code sequence (list of int), the corresponding
+    normalized correlation, list of float) of all symbols and the time where
+    the demodulation ends.
+    *symbols* is a list of signal objects, one for each coding symbol.
+    The symbols start time is assumed as phase difference with respect to the
+    signal start time.
+    *mask* is a signal objects.
+    Symbol correlation is computed only where mask = 1.
+    *origin* is the start time of the first coded symbol. If not defined, it
+    is set to start time of *mod*.
+    All symbols must have the same elapse time that is the symbol period.
+    The same holds for mask. """
+
+    # symbol period and phase
+    period = symbols[0].elapse()
+    phase = symbols[0].start
+
+    # if origin not defined, set default value
+    if origin is None:
+        origin = mod.start
+
+    # adjust origin with symbols phase
+    origin += phase
+
+    # for each symbol period
+    code = []
+    corr = []
+    corrs = []
+    for chop, last in _lookahead(mod.ichop(period,origin)):
+        # if last chop has no full period, discard it.
+        if last and chop.elapse() < period:
+            break
+        chop.shift(phase-chop.start,inplace=True)
+        cor = []
+        # correlate each symbol with current period
+        if mask:
+            for symbol in symbols:
+                cor.append((chop^symbol&mask).integral(level=0,normalize=True))
+        else:
+            for symbol in symbols:
+                cor.append((chop ^ symbol).integral(level=0,normalize=True))
+        corrs.append(cor)
+        # search symbol with highest correlation
+        cors = zip(cor,range(len(symbols)))
+        cors.sort()
+        cor, cod = cors[-1]
+        code.append(cod)
+        corr.append(cor)
+        
+    return code,corr,corrs
+
+
+def bin2pwm(bincode,elapse_0,elapse_1,period,active=1,origin=0,tscale=1.):
+    """ Convert a binary code into a pulse width modulation signal in
+    BTS format. Return a Signal class object. *bincode* is a tuple or a
+    list of tuples: (*bit_length*, *bits*). *bit_length* is an integer
+    with the number of bits. *bits* is an integer or a long integer with
+    the binary code.  First bit is the LSB, last bit is the MSB.
+    *period* is the period of pwm pulses. *elapse_0* is the elapse time
+    of a pulse coding a 0 bit. *elapse_1*, the same for a 1 bit. *active*
+    is the active pulse level. *origin* is the time of the leading edge
+    of the first signal pulse. """
+
+    # to list single tuple
+    if type(bincode) != list:
+        bincode = [bincode]
+
+    # set conventional start
+    start = origin
+
+    # convert a tuple at a time
+    edges = []
+    for bit_num, code in bincode:
+        # convert bit by bit of current tuple
+        end = bit_num * period + origin
+        t0 = origin
+        for i in range(bit_num):
             if code & 1:
                 t1 = t0 + elapse_1
             else:
@@ -1424,8 +3651,8 @@ def pwm2bin(pwm,elapse_0,elapse_1,period=None,active=1,origin=0,threshold=0.2):
         # build pulse model and mask
         margin = 0.2 * min(elapse_0,elapse_1)
         last = max(elapse_0,elapse_1) + margin
-        model_0 = Signal(-margin,[0,elapse_0],last)
-        model_1 = Signal(-margin,[0,elapse_1],last)
+        model_0 = Signal(-margin,[0.,float(elapse_0)],last)
+        model_1 = Signal(-margin,[0.,float(elapse_1)],last)
         mask = Signal(-margin,[-margin,last],last)
 
         # if active low, force pwm signal to active high
@@ -1439,29 +3666,28 @@ def pwm2bin(pwm,elapse_0,elapse_1,period=None,active=1,origin=0,threshold=0.2):
         else:
             split_origin += origin
 
-        # chop signal
-        chops = pwm.chop(period,split_origin)
-
-        # for each symbol period
+        # for each symbol period, chop signal, discard last chop.
         code = 0
         error = 0
-        for chop in chops[-2::-1]:
-            code <<= 1
-            error <<= 1
+        bit = 0
+        for chop, last in _lookahead(pwm.ichop(period,split_origin)):
+            if last:
+                break
             if len(chop) > 0:
                 chop.shift(-chop.edges[0],inplace=True)
             corr_0 = (chop ^ model_0 & mask).integral(level=0,normalize=True)
             corr_1 = (chop ^ model_1 & mask).integral(level=0,normalize=True)
             if abs(corr_0 - corr_1) > threshold:
                 if corr_0 < corr_1:
-                    code |= 1
+                    code |= 1 << bit
             else:
-                error |= 1
+                error |= 1 << bit
+            bit += 1
 
         # if active level is low, restore it into pwm signal
         if not active:
             pwm.slevel = 1
-        return (len(chops)-1,code), error
+        return (bit,code), error
 
     ## if not period, convert by pulse elapse time
     else:
@@ -1695,11 +3921,95 @@ def serial_rx(sline,char_bits=8,parity='off',stop_bits=2,baud=50):
 
 def __parity(value):
     """ Return 0 for even parity, 1 for odd parity in value. """
+    return _ones(value) & 1
+
+
+def _lookahead(iterable):
+    """ Iterate over *iterable*, yield each item with a flag that is true
+    for the last item only. """
+
+    iterator = iter(iterable)
+    try:
+        item = next(iterator)
+    except StopIteration:
+        return
+    for next_item in iterator:
+        yield item, False
+        item = next_item
+    yield item, True
+
+
+def _ones(value):
+    """ Return the number of bits at 1 in value. """
     ones = 0
     while value:
         value &= value - 1
         ones += 1
-    return ones & 1
+    return ones
+
+
+def _time(value):
+    """ Return the time *value* as float or int: numpy scalars are converted
+    to the python number of the same kind, other numbers to float. """
+
+    if type(value) in (float,int):
+        return value
+    if hasattr(value,'item'):
+        return value.item()
+    return float(value)
+
+
+def _words2signals(chunks,lanes,rate,start,count,tscale):
+    """ Return the list of signals sampled by the bit *lanes* of the sample
+    words in *chunks*, an iterator of arrays of unsigned integers, with
+    *count* words in total. See **Signal.from_packed**. """
+
+    import numpy as np
+
+    rate = float(rate)
+    edges = [[] for lane in lanes]
+    slevels = None
+    last = None
+    offset = 0
+    for chunk in chunks:
+        if not len(chunk):
+            continue
+        if last is None:
+            last = chunk[0]
+            slevels = [int(last >> lane & 1) for lane in lanes]
+        # changed bits from the previous sample
+        changes = np.empty_like(chunk)
+        changes[0] = chunk[0] ^ last
+        np.bitwise_xor(chunk[1:],chunk[:-1],changes[1:])
+        for lane, lane_edges in zip(lanes,edges):
+            pos = np.flatnonzero(changes >> lane & 1)
+            if len(pos):
+                lane_edges.extend(((pos + offset) / rate + start).tolist())
+        last = chunk[-1]
+        offset += len(chunk)
+
+    # no samples, void signals.
+    if last is None:
+        return [Signal() for lane in lanes]
+
+    end = start + count / rate
+    return [Signal(start,lane_edges,end,slevel,tscale)
+        for lane_edges, slevel in zip(edges,slevels)]
+
+
+def _random_state(seed=None):
+    """ Return a numpy random generator. *seed* can be a generator, returned
+    as is, an integer, a sequence of integers or None. If None, the seed is
+    drawn from the *random* module, so that random.seed() keeps computations
+    repeatable. """
+
+    import numpy as np
+
+    if isinstance(seed,np.random.RandomState):
+        return seed
+    if seed is None:
+        seed = random.getrandbits(32)
+    return np.random.RandomState(seed)
 
 
 def noise(start,origin,end,period_mean=1,period_stddev=1,
@@ -1767,6 +4077,1254 @@ def square(start,origin,end,period,width,active=1):
     return Signal(start,edges,end,slevel)
 
 
+def load(filename,t0=None,t1=None):
+    """ Load a signal from the binary file *filename*, in the bts file
+    format written by **Signal.save**. The edge times are memory mapped, not
+    read: if *t0* or *t1* are given, only the part of the signal from time
+    *t0* to time *t1* is returned, as **Signal.window** does, and only the
+    file pages around the window edges are read. Otherwise, the whole
+    signal is read into memory, for large files see **iload**. Edges are
+    checked with array operations. Return a signal object. Requires Numpy.
+    """
+
+    mapped = _bts_map(filename,t0,t1)
+    if mapped is None:
+        return Signal()
+    start, edges, end, slevel, tscale = mapped
+
+    return _bts_signal(start,edges,end,slevel,tscale)
+
+
+def iload(filename,size=65536,t0=None,t1=None):
+    """ Iterate over the signal in the binary file *filename*, in the bts
+    file format written by **Signal.save**, divided into time contiguous
+    chunks with at most *size* edges, as **ichunks** does. The edge times
+    are memory mapped and each chunk reads only its own edges, so opening
+    a file takes constant time and memory does not grow with the file size.
+    If *t0* or *t1* are given, only the part of the signal from time *t0*
+    to time *t1* is iterated. Requires Numpy. """
+
+    mapped = _bts_map(filename,t0,t1)
+    if mapped is None:
+        return
+    start, edges, end, slevel, tscale = mapped
+
+    # an edge at signal end stays into the last chunk, as for ichunks.
+    first = 0
+    while True:
+        last = first + size
+        if last < len(edges) and edges[last] < end:
+            chunk_end = edges[last].item()
+        else:
+            chunk_end = end
+            last = len(edges)
+        yield _bts_signal(start,edges[first:last],chunk_end,slevel,tscale)
+        if last == len(edges):
+            return
+        start = chunk_end
+        slevel ^= (last - first) & 1
+        first = last
+
+
+def _bts_map(filename,t0,t1):
+    """ Map the edges of the bts file *filename* inside the time window from
+    *t0* to *t1*, see **load**. Return pattern **(** *start, edges, end,
+    slevel, tscale* **)**, with *edges* a memory mapped array, or None if
+    the signal is void. """
+
+    import numpy as np
+
+    flags, start, end, tscale, count = _bts_header(filename)
+    if flags & _BTS_VOID:
+        return None
+    slevel = int(bool(flags & _BTS_SLEVEL))
+    if not count:
+        edges = np.zeros(0,dtype=_bts_dtype(flags))
+    else:
+        edges = np.memmap(filename,dtype=_bts_dtype(flags),mode='r',
+            offset=_BTS_HEADER.size,shape=(count,))
+
+    # time window, edges by bisection.
+    first = 0
+    last = count
+    if not t0 is None and t0 > start:
+        start = t0
+        first = int(np.searchsorted(edges,start,side='left'))
+    if not t1 is None and t1 < end:
+        end = t1
+        last = int(np.searchsorted(edges,end,side='left'))
+    if end <= start:
+        return None
+
+    return start, edges[first:last], end, slevel ^ (first & 1), tscale
+
+
+def _bts_signal(start,edges,end,slevel,tscale):
+    """ Return a new signal object with the edges of the array *edges*.
+    Edges are checked with array operations, not by **Signal.validate**.
+    """
+
+    import numpy as np
+
+    signal = Signal(start,[],end,slevel,tscale)
+    if len(edges):
+        if not start <= edges[0] or not edges[-1] <= end:
+            raise ValueError('bts file edges out of signal time span.'
+                + '\n  start time: %s' % repr(start)
+                + '\n  end time: %s' % repr(end))
+        if not np.all(edges[1:] > edges[:-1]):
+            raise ValueError('bts file edges times must be ascending.')
+        signal.edges = edges.tolist()
+
+    return signal
+
+
+def _bts_flags(signal):
+    """ Return the bts header flags of *signal* and its start and end
+    times, zero for the void signal. Without edges, the edge type is the
+    start type. Return pattern **(** *flags, start, end* **)**. """
+
+    flags = 0
+    start = end = 0.
+    if not signal:
+        flags |= _BTS_VOID
+    else:
+        start = signal.start
+        end = signal.end
+    if type((signal.edges or [start])[0]) == float:
+        flags |= _BTS_FLOAT_EDGES
+    if type(start) == float:
+        flags |= _BTS_FLOAT_START
+    if type(end) == float:
+        flags |= _BTS_FLOAT_END
+    if signal.slevel:
+        flags |= _BTS_SLEVEL
+    if type(signal.tscale) == float:
+        flags |= _BTS_FLOAT_TSCALE
+
+    return flags, start, end
+
+
+def _bts_header(filename):
+    """ Read and check the header of the bts file *filename*.
+    Return pattern **(** *flags, start, end, tscale, count* **)**. """
+
+    with open(filename,'rb') as bts:
+        header = bts.read(_BTS_HEADER.size)
+    if len(header) < _BTS_HEADER.size:
+        raise ValueError('bts file header truncated: %s' % filename)
+    magic, version, flags, start, end, tscale, count = \
+        _BTS_HEADER.unpack(header)
+    if magic != _BTS_MAGIC:
+        raise ValueError('not a bts file: %s' % filename)
+    if version != _BTS_VERSION:
+        raise ValueError('bts file version %d not supported: %s' %
+            (version,filename))
+    start, end, tscale = _bts_unpack_times(flags,start,end,tscale)
+
+    return flags, start, end, tscale, count
+
+
+def _bts_pack_header(flags,start,end,tscale,count):
+    """ Return the bts file header with *flags*, *start* and *end* times,
+    time scale *tscale* and *count* edges, as a string of bytes. """
+
+    return _BTS_HEADER.pack(_BTS_MAGIC,_BTS_VERSION,flags,
+        *_bts_pack_times(flags,start,end) + (tscale,count))
+
+
+def _bts_pack_times(flags,start,end):
+    """ Return the *start* and *end* times packed as 64 bit floats or
+    integers, as given by the header *flags*. """
+
+    pack = lambda value, is_float: struct.pack(is_float and '<d' or '<q',
+        value)
+
+    return pack(start,flags & _BTS_FLOAT_START), \
+        pack(end,flags & _BTS_FLOAT_END)
+
+
+def _bts_unpack_times(flags,start,end,tscale):
+    """ Return the packed *start* and *end* times and the time scale
+    *tscale* with the types given by the header *flags*. """
+
+    unpack = lambda value, is_float: struct.unpack(is_float and '<d' or '<q',
+        value)[0]
+    start = unpack(start,flags & _BTS_FLOAT_START)
+    end = unpack(end,flags & _BTS_FLOAT_END)
+    if not flags & _BTS_FLOAT_TSCALE:
+        tscale = int(tscale)
+
+    return start, end, tscale
+
+
+def _bts_dtype(flags):
+    """ Return the numpy data type of the edge times of a bts file with
+    header *flags*. """
+
+    if flags & _BTS_FLOAT_EDGES:
+        return '<f8'
+    return '<i8'
+
+
+def pack_signal(signal,tick=None,compression='zlib',level=6):
+    """ Return *signal* packed into a compact string of bytes, to be
+    unpacked by **unpack_signal**. Integer edge times are stored as
+    differences from the previous edge, coded as variable length integers
+    (LEB128), a byte for each 7 bits. If *tick* is given, float edge times
+    are rounded to integer multiples of *tick* from signal start and stored
+    in the same way: the rounding error is at most half *tick*, or a *tick*
+    for edges clamped to the last tick before signal end, signals
+    with regular edge spacing are coded exactly and with few bytes. Other
+    float edge times are stored as raw 64 bit floats. The result is then
+    compressed by *compression*: 'zlib', 'bz2', 'lzma' (if available) or
+    None, with compression *level*. Requires Numpy. """
+
+    import numpy as np
+
+    # header flags and times, as bts file.
+    flags, start, end = _bts_flags(signal)
+
+    # edges coding
+    edges = np.asarray(signal.edges,dtype=_bts_dtype(flags))
+    if not flags & (_BTS_FLOAT_EDGES | _BTS_FLOAT_START):
+        coding = _CODEC_VARINT
+        ticks = edges - start
+    elif tick and flags & _BTS_FLOAT_EDGES:
+        coding = _CODEC_TICKS
+        # rounded edges are clamped to the last tick before end.
+        last = math.floor((end - start) / tick)
+        while start + last * tick > end:
+            last -= 1
+        ticks = np.minimum(np.round((edges - start) / tick),last)
+        ticks = ticks.astype(np.int64)
+        if (np.diff(ticks) <= 0).any():
+            raise ValueError('tick too large, edges with same tick.')
+    else:
+        coding = _CODEC_RAW
+    if coding == _CODEC_RAW:
+        data = edges.tostring()
+    else:
+        data = _varint_encode(np.diff(ticks,prepend=0).astype(np.uint64))
+
+    header = _CODEC_HEADER.pack(_CODEC_MAGIC,coding,
+        _CODEC_COMPRESSIONS.index(compression),flags,
+        *_bts_pack_times(flags,start,end) + (signal.tscale,tick or 0.,
+        len(edges)))
+    if compression:
+        data = _compressor(compression).compress(data,level)
+
+    return header + data
+
+
+def unpack_signal(data):
+    """ Return the signal packed into the string of bytes *data* by
+    **pack_signal**. Requires Numpy. """
+
+    import numpy as np
+
+    magic, coding, compression, flags, start, end, tscale, tick, count = \
+        _CODEC_HEADER.unpack_from(data)
+    if magic != _CODEC_MAGIC:
+        raise ValueError('not a packed signal.')
+    start, end, tscale = _bts_unpack_times(flags,start,end,tscale)
+    if flags & _BTS_VOID:
+        return Signal()
+
+    data = data[_CODEC_HEADER.size:]
+    compression = _CODEC_COMPRESSIONS[compression]
+    if compression:
+        data = _compressor(compression).decompress(data)
+    if coding == _CODEC_RAW:
+        edges = np.frombuffer(data,dtype=_bts_dtype(flags))
+    else:
+        ticks = np.cumsum(_varint_decode(data,count).astype(np.int64))
+        if coding == _CODEC_TICKS:
+            edges = start + ticks * tick
+        else:
+            edges = start + ticks
+
+    return Signal(start,edges.tolist(),end,int(bool(flags & _BTS_SLEVEL)),
+        tscale)
+
+
+def _compressor(compression):
+    """ Return the module implementing *compression*. """
+
+    try:
+        return __import__(compression)
+    except ImportError:
+        raise ValueError('compression not available: %s' % compression)
+
+
+def _varint_encode(values):
+    """ Return the array of unsigned integers *values* coded as LEB128
+    variable length integers, as a string of bytes. Requires Numpy. """
+
+    import numpy as np
+
+    if not len(values):
+        return ''
+
+    # bytes of each value: 7 bits each, at least one.
+    sizes = np.ones(len(values),dtype=np.int64)
+    for k in range(1,10):
+        sizes += (values >> np.uint64(7 * k)) > 0
+    width = sizes.max()
+    codes = np.empty((len(values),width),dtype=np.uint8)
+    for k in range(width):
+        codes[:,k] = (values >> np.uint64(7 * k)) & np.uint64(0x7f)
+        codes[:,k] |= (sizes > k + 1).astype(np.uint8) << 7
+
+    return codes[np.arange(width) < sizes[:,None]].tostring()
+
+
+def _varint_decode(data,count):
+    """ Return the array of the *count* unsigned integers coded as LEB128
+    variable length integers by the string of bytes *data*. Requires Numpy.
+    """
+
+    import numpy as np
+
+    codes = np.frombuffer(data,dtype=np.uint8)
+    if not count:
+        return np.zeros(0,dtype=np.uint64)
+
+    # each value ends at a byte without continuation bit.
+    last = codes < 0x80
+    starts = np.empty(count,dtype=np.int64)
+    starts[0] = 0
+    starts[1:] = np.flatnonzero(last)[:-1] + 1
+    value = np.cumsum(last) - last
+    shifts = (np.arange(len(codes)) - starts[value]) * 7
+    bits = (codes & 0x7f).astype(np.uint64) << shifts.astype(np.uint64)
+
+    return np.add.reduceat(bits,starts)
+
+
+def to_table(signals,names=None):
+    """ Return the table of the edges of *signals*, a list of signal
+    objects, in columnar form: a dictionary of numpy arrays, one for each
+    column, with keys 'channel', 'time' and 'level'. Each signal has a row
+    for its start, with its start level, and a row for each edge, with the
+    level after it. The channel column is the signal position into
+    *signals*, the list of channel names is returned too, with key 'names':
+    *names* or, if None, s0, s1, ... The columns are in the layout of
+    Arrow arrays, see **to_arrow**. Void signals have no rows.
+    Requires Numpy. """
+
+    import numpy as np
+
+    if names is None:
+        names = ['s%d' % i for i in range(len(signals))]
+    channels, times, levels = [], [], []
+    for i, signal in enumerate(signals):
+        if not signal:
+            continue
+        rows = len(signal) + 1
+        channels.append(np.full(rows,i,dtype=np.int32))
+        time = np.empty(rows,dtype=np.result_type(signal.start,
+            *signal.edges[:1]))
+        time[0] = signal.start
+        time[1:] = signal.edges
+        times.append(time)
+        levels.append((np.arange(rows,dtype=np.uint8) & 1) ^ signal.slevel)
+    if not channels:
+        return {'channel':np.zeros(0,dtype=np.int32),
+            'time':np.zeros(0),'level':np.zeros(0,dtype=np.uint8),
+            'names':list(names)}
+
+    return {'channel':np.concatenate(channels),'time':np.concatenate(times),
+        'level':np.concatenate(levels),'names':list(names)}
+
+
+def to_arrow(signals,names=None):
+    """ Return the table of the edges of *signals*, see **to_table**, as an
+    Arrow table. The channel column is dictionary encoded with the channel
+    names. The numeric columns are not copied from the numpy arrays.
+    Requires Numpy and Pyarrow. """
+
+    import pyarrow as pa
+
+    table = to_table(signals,names)
+    channel = pa.DictionaryArray.from_arrays(pa.array(table['channel']),
+        pa.array(table['names']))
+
+    return pa.Table.from_arrays([channel,pa.array(table['time']),
+        pa.array(table['level'])],['channel','time','level'])
+
+
+def read_vcd(filename,names=None,end=None,block_size=1 << 20):
+    """ Read the scalar wires of the Value Change Dump file *filename*.
+    Return a dictionary of signals, with the wire hierarchical names,
+    scope names and wire name joined by dots, as keys. If *names* is a list
+    of names, only these wires are read, the others are not stored.
+    The file is read in blocks of *block_size* bytes, so only the returned
+    signals grow with the file size. Edge times are integer VCD times and
+    the signal time scale is given by the VCD timescale. Values x and z are
+    taken as level 0. All signals start at the first VCD time, their start
+    levels are the values dumped at that time. They end at *end*, if None
+    at the last VCD time. """
+
+    if not names is None:
+        names = set(names)
+
+    # wires by VCD id: names, start level, edges.
+    wires = {}
+    scopes = []
+    tscale = 1.
+    time = None
+    start = None
+
+    with open(filename,'rb') as vcd:
+        tokens = _vcd_tokens(vcd,block_size)
+        for token in tokens:
+            # value changes
+            if token[0] in '01xzXZ':
+                wire = wires.get(token[1:])
+                if wire is None:
+                    continue
+                level = int(token[0] == '1')
+                edges = wire[2]
+                if time == start:
+                    wire[1] = level
+                elif level != len(edges) & 1 ^ wire[1]:
+                    # a change back at same time cancels the change
+                    if edges and edges[-1] == time:
+                        del edges[-1]
+                    else:
+                        edges.append(time)
+            elif token[0] == '#':
+                time = int(token[1:])
+                if start is None:
+                    start = time
+            elif token[0] in 'bBrR':
+                next(tokens)
+            # declarations
+            elif token == '$var':
+                fields = _vcd_fields(tokens)
+                name = '.'.join(scopes + [fields[3]])
+                if fields[1] == '1' and (names is None or name in names):
+                    wires.setdefault(fields[2],[[],0,[]])[0].append(name)
+            elif token == '$scope':
+                scopes.append(_vcd_fields(tokens)[1])
+            elif token == '$upscope':
+                scopes.pop()
+                _vcd_fields(tokens)
+            elif token == '$timescale':
+                tscale = _vcd_tscale(''.join(_vcd_fields(tokens)))
+            elif token in ('$comment','$date','$version'):
+                _vcd_fields(tokens)
+
+    # build signals
+    if end is None:
+        end = time
+    signals = {}
+    for wire_names, slevel, edges in wires.values():
+        if start is None or end <= start:
+            signal = Signal()
+        else:
+            signal = Signal(start,edges,end,slevel,tscale)
+        for name in wire_names:
+            signals[name] = signal
+
+    return signals
+
+
+def write_vcd(filename,signals,names=None,tscale=None,scope='bitis'):
+    """ Write *signals*, a list of signal objects, as scalar wires into the
+    Value Change Dump file *filename*. *names* is the list of wire names,
+    default s0, s1, ... The wires are declared into the module *scope*.
+    *tscale* is the time scale of the VCD times, it must be a VCD timescale:
+    1, 10 or 100 times a second, millisecond, ..., femtosecond. If None, it
+    is the time scale of the first signal. Signal times are converted to
+    the nearest VCD time. The value changes of all signals are merged in
+    time order, without copying them. Before its start, a wire is x. """
+
+    # void signals are not written, if none, nothing to write.
+    if names is None:
+        names = ['s%d' % i for i in range(len(signals))]
+    names = [name for name, signal in zip(names,signals) if signal]
+    signals = [signal for signal in signals if signal]
+    if not signals:
+        return
+    if tscale is None:
+        tscale = signals[0].tscale
+    unit = _vcd_unit(tscale)
+
+    # wire ids, printable characters from ! to ~.
+    ids = []
+    for i in range(len(signals)):
+        code = ''
+        while True:
+            code += chr(33 + i % 94)
+            i //= 94
+            if not i:
+                break
+        ids.append(code)
+
+    def vcd_time(time,signal):
+        """ Return *time* of *signal* as VCD time. """
+        return int(round(time * float(tscale) / signal.tscale))
+
+    def changes(i,signal):
+        """ Yield the value changes of a signal, but the dumped ones. """
+        level = signal.slevel
+        if vcd_time(signal.start,signal) > start:
+            yield vcd_time(signal.start,signal), i, level
+        for edge in signal.edges:
+            level ^= 1
+            yield vcd_time(edge,signal), i, level
+
+    start = min([vcd_time(signal.start,signal) for signal in signals])
+    end = max([vcd_time(signal.end,signal) for signal in signals])
+
+    with open(filename,'wb') as vcd:
+        vcd.write('$timescale %s $end\n' % unit)
+        vcd.write('$scope module %s $end\n' % scope)
+        for code, name in zip(ids,names):
+            vcd.write('$var wire 1 %s %s $end\n' % (code,name))
+        vcd.write('$upscope $end\n$enddefinitions $end\n')
+        vcd.write('#%d\n$dumpvars\n' % start)
+        for code, signal in zip(ids,signals):
+            if vcd_time(signal.start,signal) > start:
+                vcd.write('x%s\n' % code)
+            else:
+                vcd.write('%d%s\n' % (signal.slevel,code))
+        vcd.write('$end\n')
+        time = start
+        for change_time, i, level in heapq.merge(
+                *[changes(i,signal) for i, signal in enumerate(signals)]):
+            if change_time != time:
+                time = change_time
+                vcd.write('#%d\n' % time)
+            vcd.write('%d%s\n' % (level,ids[i]))
+        if end > time:
+            vcd.write('#%d\n' % end)
+
+
+def _vcd_tokens(vcd,block_size):
+    """ Yield the tokens of the VCD file object *vcd*, read in blocks of
+    *block_size* bytes. """
+
+    rest = ''
+    while True:
+        block = vcd.read(block_size)
+        if not block:
+            break
+        tokens = (rest + block).split()
+        # last token may continue into next block
+        if block[-1].isspace():
+            rest = ''
+        else:
+            rest = tokens.pop()
+        for token in tokens:
+            yield token
+    if rest:
+        yield rest
+
+
+def _vcd_fields(tokens):
+    """ Return the list of the declaration fields up to $end. """
+
+    fields = []
+    for token in tokens:
+        if token == '$end':
+            break
+        fields.append(token)
+
+    return fields
+
+
+_VCD_UNITS = [('s',1.),('ms',1e3),('us',1e6),('ns',1e9),('ps',1e12),
+    ('fs',1e15)]
+
+
+def _vcd_tscale(timescale):
+    """ Return the signal time scale of a VCD *timescale*, as '10ns'. """
+
+    number = timescale.rstrip('munpfs')
+    for unit, scale in _VCD_UNITS:
+        if timescale[len(number):] == unit:
+            return scale / int(number)
+    raise ValueError('unknown VCD timescale: %s' % timescale)
+
+
+def _vcd_unit(tscale):
+    """ Return the VCD timescale of the signal time scale *tscale*. """
+
+    for unit, scale in _VCD_UNITS:
+        for number in (1,10,100):
+            if abs(scale / number - tscale) <= 1e-9 * tscale:
+                return '%d %s' % (number,unit)
+    raise ValueError('time scale is not a VCD timescale: %s' % tscale)
+
+
+def read_csv(filename,channels=None,delimiter=',',skip_header=0,end=None,
+        dtype=float,chunk_lines=1 << 16,tscale=1.):
+    """ Read the logic analyzer export file *filename*, with one row for
+    each sample: the time, the channel name and the value, separated by
+    *delimiter*. The first *skip_header* lines are skipped. Return a
+    dictionary of signals, with the channel names as keys. If *channels* is
+    a list of names, only these channels are read. Each channel starts at
+    its first row time, with its value as start level. Rows without a value
+    change are dropped, so a channel may be sampled any number of times.
+    Signals end at *end*, if None at the last row time. Times are converted
+    to *dtype*, float or int. *tscale* is the signal time scale.
+    Rows are read and converted in chunks of *chunk_lines* by numpy.
+    Requires Numpy. """
+
+    import numpy as np
+
+    if not channels is None:
+        channels = set(channels)
+
+    # channel state: start, start level, level, edges.
+    states = {}
+    last = None
+    with open(filename,'rb') as csv:
+        for i in range(skip_header):
+            csv.readline()
+        while True:
+            lines = list(itertools.islice(csv,chunk_lines))
+            if not lines:
+                break
+            rows = np.array(''.join(lines).replace(delimiter,' ').split())
+            rows = rows.reshape(-1,3)
+            times = rows[:,0].astype(dtype)
+            names = rows[:,1]
+            values = (rows[:,2].astype(float) != 0).astype(np.int8)
+            last = times[-1].item()
+            for name in np.unique(names):
+                if not channels is None and not name in channels:
+                    continue
+                rows = names == name
+                channel_times = times[rows]
+                channel_values = values[rows]
+                state = states.get(name)
+                if state is None:
+                    state = states[name] = [channel_times[0].item(),
+                        int(channel_values[0]),int(channel_values[0]),[]]
+                # keep value changes only
+                changes = np.empty(len(channel_values),dtype=bool)
+                changes[0] = channel_values[0] != state[2]
+                changes[1:] = channel_values[1:] != channel_values[:-1]
+                state[3].extend(channel_times[changes].tolist())
+                state[2] = int(channel_values[-1])
+
+    # build signals
+    if end is None:
+        end = last
+    signals = {}
+    for name, (start, slevel, level, edges) in states.items():
+        if end > start:
+            signals[name] = Signal(start,edges,end,slevel,tscale)
+        else:
+            signals[name] = Signal()
+
+    return signals
+
+
+def read_timestamps(filename,start=None,end=None,slevel=0,skip_header=0,
+        dtype=float,chunk_lines=1 << 16,tscale=1.):
+    """ Read the timestamp export file *filename*, with the time of one edge
+    for each line, after the first *skip_header* lines. Return the signal
+    with these edges, from *start* to *end*: if None, the first and the last
+    edge time. *slevel* is the signal start level. Times are converted to
+    *dtype*, float or int. *tscale* is the signal time scale.
+    Lines are read and converted in chunks of *chunk_lines* by numpy.
+    Requires Numpy. """
+
+    import numpy as np
+
+    edges = []
+    with open(filename,'rb') as timestamps:
+        for i in range(skip_header):
+            timestamps.readline()
+        while True:
+            lines = list(itertools.islice(timestamps,chunk_lines))
+            if not lines:
+                break
+            edges.extend(np.fromstring(''.join(lines),dtype=dtype,
+                sep=' ').tolist())
+
+    # if no edges and no domain, return a void signal.
+    if start is None:
+        if not edges:
+            return Signal()
+        start = edges[0]
+    if end is None:
+        if not edges:
+            return Signal()
+        end = edges[-1]
+    if end <= start:
+        return Signal()
+
+    return Signal(start,edges,end,slevel,tscale)
+
+
+def pack_frame(edges):
+    """ Return the binary timestamp frame of *edges*, a sequence of edge
+    times, as read by **EdgeServer**. """
+
+    frame = array.array('d',edges)
+    if sys.byteorder == 'big':
+        frame.byteswap()
+
+    return struct.pack('<I',len(frame)) + frame.tostring()
+
+
+def ichunks(signal,size):
+    """ Iterate over *signal* divided into time contiguous chunks, each with
+    at most *size* edges, the last one may have one more edge at the signal
+    end time. Each chunk ends at the first edge of the next chunk. The
+    chunk iterator is the input of the chunk processing functions: **iand**,
+    **ior**, **ixor**, **iinvert**, **ishift**, **ideglitch**,
+    **iintegral**, **iserial_rx**, **ipwm2bin**. """
+
+    # void signal, no chunks.
+    if not signal:
+        return
+
+    # an edge at signal end stays into the last chunk, with no void chunk.
+    start = signal.start
+    first = 0
+    while True:
+        last = first + size
+        if last < len(signal) and signal.edges[last] < signal.end:
+            end = signal.edges[last]
+        else:
+            end = signal.end
+            last = len(signal)
+        yield signal.view([start,first,last,end])
+        if last == len(signal):
+            return
+        start = end
+        first = last
+
+
+def imerge(sources,window,start=None,end=None,slevel=0,chunk_size=1024,
+        report=None,tscale=1.):
+    """ Merge the edge times of many *sources* into one signal, yielded as
+    a chunk iterator. Each source is an iterable of edge times, sorted or
+    nearly sorted: an edge may come after newer edges of the same source,
+    if not newer than it by more than *window*. Sources are read a edge at a
+    time, the one behind first, and edges are kept in a heap until all
+    sources are past them by *window*, so no sort of the whole edges is
+    done. A chunk is yielded each *chunk_size* merged edges.
+    *start* is the start time of the merged signal, if None the first edge
+    time. *end* is its end time, if None the last edge time. *slevel* is its
+    start level. Sources may be numpy arrays, numpy times are converted to
+    python numbers. Duplicate edges and edges late by more than *window* are
+    dropped. If *report* is a list, a tuple (*time*, *source*, *kind*) is
+    appended to it for each dropped edge: the edge time, the source index
+    and 'duplicate' or 'late'. """
+
+    if not start is None:
+        start = _time(start)
+    if not end is None:
+        end = _time(end)
+
+    # heap of sources, the one behind first, and heap of edges.
+    readers = [(-float('inf'),i,iter(source))
+        for i, source in enumerate(sources)]
+    edges = []
+    merged = []
+    last = None
+
+    def drop(time,i,kind):
+        if not report is None:
+            report.append((time,i,kind))
+
+    while readers or edges:
+        # read the source behind, the safe time is the time all sources
+        # are past by window.
+        if readers:
+            watermark, i, reader = heapq.heappop(readers)
+            time = next(reader,None)
+            if not time is None:
+                time = _time(time)
+                if not last is None and time < last:
+                    drop(time,i,'late')
+                else:
+                    heapq.heappush(edges,(time,i))
+                heapq.heappush(readers,(max(watermark,time),i,reader))
+            if not readers:
+                safe = float('inf')
+            elif readers[0][0] == -float('inf'):
+                continue
+            else:
+                safe = readers[0][0] - window
+        else:
+            safe = float('inf')
+
+        # merge edges up to safe time
+        while edges and edges[0][0] <= safe:
+            time, i = heapq.heappop(edges)
+            if time == last:
+                drop(time,i,'duplicate')
+                continue
+            merged.append(time)
+            last = time
+            if start is None:
+                start = time
+
+        # yield merged edges
+        if len(merged) >= chunk_size and start < safe < float('inf'):
+            chunk = Signal(start,merged,safe,slevel,tscale)
+            start = safe
+            slevel ^= len(merged) & 1
+            merged = []
+            yield chunk
+
+    # last chunk
+    if end is None:
+        end = last
+    if not start is None and end > start:
+        yield Signal(start,merged,end,slevel,tscale)
+
+
+def collect(chunks):
+    """ Return the signal object joining all chunks of the chunk iterator
+    *chunks*. """
+
+    signal = Signal()
+    for chunk in chunks:
+        signal.append(chunk)
+
+    return signal
+
+
+def ibioper(chunks_a,chunks_b,operator):
+    """ Iterate over the logic *operator* (see **LogicOperator**) of two
+    chunk iterators, *chunks_a* and *chunks_b*. The input that is behind in
+    time is read first, so only the chunks overlapping in time are kept in
+    memory. Yield the output chunks. """
+
+    logic = LogicOperator(operator)
+    inputs = [iter(chunks_a),iter(chunks_b)]
+    ends = [None,None]
+    while True:
+        # read the input that is behind, stop when it is exhausted.
+        if ends[0] is None or ends[1] is not None and ends[0] <= ends[1]:
+            i = 0
+        else:
+            i = 1
+        chunk = next(inputs[i],None)
+        if chunk is None:
+            return
+        if not chunk:
+            continue
+        ends[i] = chunk.end
+        if i:
+            out = logic.feed(b=chunk)
+        else:
+            out = logic.feed(a=chunk)
+        if out:
+            yield out
+
+
+def iand(chunks_a,chunks_b):
+    """ Iterate over the logic *and* of two chunk iterators. """
+
+    return ibioper(chunks_a,chunks_b,'and')
+
+
+def ior(chunks_a,chunks_b):
+    """ Iterate over the logic *or* of two chunk iterators. """
+
+    return ibioper(chunks_a,chunks_b,'or')
+
+
+def ixor(chunks_a,chunks_b):
+    """ Iterate over the logic *xor* of two chunk iterators. """
+
+    return ibioper(chunks_a,chunks_b,'xor')
+
+
+def iinvert(chunks):
+    """ Iterate over the logic *not* of a chunk iterator. """
+
+    for chunk in chunks:
+        yield ~chunk
+
+
+def ishift(chunks,offset):
+    """ Iterate over the chunks of a chunk iterator shifted in time by
+    *offset*. """
+
+    for chunk in chunks:
+        yield chunk.shift(offset)
+
+
+def ideglitch(chunks,width):
+    """ Iterate over the chunks of a chunk iterator without the pulses
+    shorter than *width*, see **Signal.deglitch**. The edges of the last
+    *width* time of each input chunk may still be cancelled, they are
+    returned with the next output chunk. """
+
+    kept = []
+    start = slevel = None
+    for chunk in chunks:
+        if not chunk:
+            continue
+        if start is None:
+            start = chunk.start
+            slevel = chunk.slevel
+
+        # an edge closer than width to the last kept edge cancels it
+        for edge in chunk.edges:
+            if kept and edge - kept[-1] < width:
+                del kept[-1]
+            else:
+                kept.append(edge)
+
+        # edges before chunk end - width are final, yield them.
+        end = chunk.end - width
+        if end > start:
+            pos = bisect.bisect_right(kept,end)
+            out = Signal(start,kept[:pos],end,slevel,chunk.tscale)
+            del kept[:pos]
+            start = end
+            slevel = out.end_level()
+            yield out
+
+        last_end = chunk.end
+        tscale = chunk.tscale
+
+    # last chunk, all edges are final.
+    if not start is None and last_end > start:
+        yield Signal(start,kept,last_end,slevel,tscale)
+
+
+def iintegral(chunks,level=1,normalize=False):
+    """ Return the integral of a chunk iterator: the elapsed time at the
+    level specified by *level*, absolute or normalized, see
+    **Signal.integral**. If there are no chunks, return none. """
+
+    integral = 0
+    elapse = 0
+    for chunk in chunks:
+        if chunk:
+            integral += chunk.integral(level)
+            elapse += chunk.elapse()
+    if not elapse:
+        return None
+    if normalize:
+        integral = float(integral) / elapse
+
+    return integral
+
+
+def iserial_tx(chars,times,char_bits=8,parity='off',stop_bits=2,baud=50,
+        tscale=1.):
+    """ Iterate over the serial line signal coding the characters *chars*,
+    one chunk for each character. For the arguments see **serial_tx**.
+    A character starting before the end of the previous one is delayed,
+    as a fifo does. """
+
+    end = None
+    for char, time in zip(chars,times):
+        if not end is None and time < end:
+            time = end
+        chunk = serial_tx([char],[time],char_bits,parity,stop_bits,baud,
+            tscale)
+        if not end is None:
+            chunk.start = end
+        end = chunk.end
+        yield chunk
+
+
+def iserial_rx(chunks,char_bits=8,parity='off',stop_bits=2,baud=50):
+    """ Iterate over the characters received from the serial line chunk
+    iterator *chunks*, see **SerialReceiver**. Yield tuples
+    (*char*, *time*, *status*) as soon as each character is complete. """
+
+    receiver = SerialReceiver(char_bits,parity,stop_bits,baud)
+    for chunk in chunks:
+        for received in zip(*receiver.feed(chunk)):
+            yield received
+    for received in zip(*receiver.close()):
+        yield received
+
+
+def ibin2pwm(bincode,elapse_0,elapse_1,period,active=1,origin=0,tscale=1.):
+    """ Iterate over the pulse width modulation signal coding *bincode*,
+    one chunk for each (*bit_length*, *bits*) tuple. For the arguments see
+    **bin2pwm**. """
+
+    # to list single tuple
+    if type(bincode) != list:
+        bincode = [bincode]
+
+    for code in bincode:
+        chunk = bin2pwm(code,elapse_0,elapse_1,period,active,origin,tscale)
+        if chunk:
+            origin = chunk.end
+            yield chunk
+
+
+def ipwm2bin(chunks,elapse_0,elapse_1,active=1):
+    """ Iterate over the bits decoded from the pulse width modulation chunk
+    iterator *chunks*, by testing the active pulse level elapse against
+    the mean of *elapse_0* and *elapse_1*, as **pwm2bin** without period
+    does. Yield one bit for each complete active pulse, the first pulse
+    first. """
+
+    threshold = (elapse_0 + elapse_1) / 2.
+    one_is_above = elapse_0 < elapse_1
+    rising = None
+    for chunk in chunks:
+        level = chunk.slevel
+        for edge in chunk.edges:
+            level ^= 1
+            if level == active:
+                rising = edge
+            elif not rising is None:
+                yield int((edge - rising > threshold) == one_is_above)
+                rising = None
+
+
+def plotchars(signals,charnum,origin=None,end=None,names=None,ticks=10):
+    """ Semigraphic timing diagram of many signals, aligned in time, with
+    unicode line drawing characters, see **Signal.plotchar**.
+    Require locale setting. Requires Numpy.
+
+      **signals**: list of signal objects.
+
+      **charnum**: integer, the length of the rendering of each signal.
+
+      **origin**: float, the rendering start time. If None, the earliest
+      signal start time.
+
+      **end**: float, the rendering end time. If None, the latest signal end
+      time.
+
+      **names**: list of strings, the signal names, put before their
+      renderings. If None, no names.
+
+      **ticks**: integer, the number of characters between time axis ticks.
+
+    Return the list of the rendering lines, as utf-8 encoded strings: two
+    lines for each signal, top and bottom rows, then the time axis and the
+    tick times.
+    """
+
+    # rendering time domain, from not void signals.
+    domain = [signal for signal in signals if signal]
+    if origin is None:
+        origin = min([signal.start for signal in domain])
+    if end is None:
+        end = max([signal.end for signal in domain])
+
+    # name column
+    if names is None:
+        names = [''] * len(signals)
+        width = 0
+    else:
+        width = max([len(name) for name in names]) + 1
+    pad = ' ' * width
+
+    lines = []
+    for signal, name in zip(signals,names):
+        if signal:
+            cells = signal._plotchar_cells(charnum,origin,end)
+        else:
+            cells = [_PLOTCHAR_CELLS[-1]] * charnum
+        topchars, botchars = zip(*cells)
+        lines.append(name.ljust(width) + ''.join(topchars))
+        lines.append(pad + ''.join(botchars))
+
+    # time axis: tick marks and tick times, if room for them.
+    axis = [LIGHT_HORIZONTAL] * charnum
+    times = [' '] * charnum
+    free = 0
+    for c in range(0,charnum,ticks):
+        axis[c] = LIGHT_DOWN_AND_HORIZONTAL
+        label = '%g' % (origin + (end - origin) * c / float(charnum))
+        if c >= free and c + len(label) <= charnum:
+            times[c:c + len(label)] = label
+            free = c + len(label) + 1
+    lines.append(pad + ''.join(axis))
+    lines.append(pad + ''.join(times))
+
+    return [line.encode('utf-8') for line in lines]
+
+
+def ber(link,trials=1000,processes=1,seed=None,confidence=0.95,
+        precision=0.1,min_errors=10,chunk=8):
+    """ Monte Carlo bit error rate engine. Run up to *trials* independent
+    trials of a link simulation (encode, impairment, decode) and count
+    character, bit and frame errors. Requires Numpy.
+
+      **link**: callable, a trial: called with a numpy random generator, it
+      returns the counts **(** *chars, char_errors, bits, bit_errors* **)**.
+      See **SerialLink** and **PwmLink**. When *processes* > 1 it must be
+      picklable. A frame is one trial, it is wrong if any bit is wrong.
+
+      **trials**: positive integer, the maximum number of trials.
+
+      **processes**: positive integer or None, the number of worker
+      processes. If 1, trials run in the calling process. If None, one
+      process for each cpu.
+
+      **seed**: None or integer, the master seed. Each trial has its
+      own random stream seeded by the master seed and by the trial index,
+      so results do not depend on the number of processes. If None, the
+      master seed is drawn from the *random* module.
+
+      **confidence**: float, the confidence level of the bit error rate
+      interval.
+
+      **precision**: float or None, early stop threshold. Trials are stopped
+      when at least *min_errors* bit errors are counted and the interval half
+      width is less than *precision* times the bit error rate. If None,
+      all trials are run.
+
+      **chunk**: positive integer, number of trials sent at once to a worker.
+
+    Return a dict with the following keys.
+
+      **trials**, **chars**, **bits**: integers, the number of completed
+      trials, of transmitted characters and bits.
+
+      **char_errors**, **bit_errors**, **frame_errors**: integers, the
+      error counts.
+
+      **cer**, **ber**, **fer**: floats, the character, bit and frame error
+      rates.
+
+      **ber_interval**: tuple of two floats, the Wilson score interval of
+      the bit error rate at the given *confidence*.
+
+      **stopped**: boolean, true if trials were stopped early.
+
+      **times**: list of floats, the elapse time of each completed trial,
+      sorted by trial index.
+
+      **elapse**: float, the overall elapse time.
+    """
+
+    import multiprocessing
+    import time
+
+    # master seed and normal quantile of confidence level
+    if seed is None:
+        seed = random.getrandbits(31)
+    z = _normal_quantile(0.5 + confidence * 0.5)
+
+    # accumulators
+    stats = dict.fromkeys(('trials','chars','char_errors','bits',
+        'bit_errors','frame_errors'),0)
+    times = []
+    stopped = False
+    start_time = time.time()
+
+    # run trials, serially or in a process pool.
+    tasks = [(link,seed,index) for index in range(trials)]
+    if processes == 1:
+        pool = None
+        results = (_ber_trial(task) for task in tasks)
+    else:
+        pool = multiprocessing.Pool(processes)
+        results = pool.imap_unordered(_ber_trial,tasks,chunk)
+    # results are counted in trial index order: out of order results are
+    # kept until all previous trials are counted, so the early stop does
+    # not depend on the process scheduling.
+    waiting = {}
+    try:
+        for result in results:
+            waiting[result[0]] = result
+            while not stopped and stats['trials'] in waiting:
+                index, chars, char_errors, bits, bit_errors, elapse = \
+                    waiting.pop(stats['trials'])
+                stats['trials'] += 1
+                stats['chars'] += chars
+                stats['char_errors'] += char_errors
+                stats['bits'] += bits
+                stats['bit_errors'] += bit_errors
+                stats['frame_errors'] += bit_errors > 0
+                times.append((index,elapse))
+
+                # if confidence interval is tight enough, stop.
+                if precision and stats['bit_errors'] >= min_errors \
+                        and stats['trials'] < trials:
+                    low, high = _wilson(stats['bit_errors'],stats['bits'],z)
+                    rate = float(stats['bit_errors']) / stats['bits']
+                    stopped = (high - low) * 0.5 <= precision * rate
+            if stopped:
+                break
+    finally:
+        if pool:
+            pool.terminate()
+            pool.join()
+
+    # summary
+    stats['cer'] = float(stats['char_errors']) / max(stats['chars'],1)
+    stats['ber'] = float(stats['bit_errors']) / max(stats['bits'],1)
+    stats['fer'] = float(stats['frame_errors']) / max(stats['trials'],1)
+    stats['ber_interval'] = _wilson(stats['bit_errors'],stats['bits'],z)
+    stats['stopped'] = stopped
+    stats['times'] = [elapse for index, elapse in sorted(times)]
+    stats['elapse'] = time.time() - start_time
+
+    return stats
+
+
+def _ber_trial(task):
+    """ Run a **ber** trial *task*: (*link*, *seed*, *index*). Return the
+    trial index, the link counts and the trial elapse time. """
+
+    import time
+
+    link, seed, index = task
+
+    # independent random streams for the trial: numpy generator and
+    # random module, used by noise. Random module state is restored.
+    rand = _random_state([seed,index])
+    state = random.getstate()
+    random.seed(rand.randint(0,2**31))
+    try:
+        start_time = time.time()
+        counts = link(rand)
+        elapse = time.time() - start_time
+    finally:
+        random.setstate(state)
+
+    return (index,) + tuple(counts) + (elapse,)
+
+
+def _wilson(errors,trials,z):
+    """ Return the Wilson score interval **(** *low, high* **)** of a
+    binomial proportion with *errors* successes over *trials*, for the
+    normal quantile *z*. """
+
+    if not trials:
+        return 0., 1.
+    p = float(errors) / trials
+    z2 = z * z
+    center = (p + z2 / (2. * trials)) / (1. + z2 / trials)
+    half = z * math.sqrt(p * (1. - p) / trials + z2 / (4. * trials * trials)) \
+        / (1. + z2 / trials)
+
+    return max(0.,center - half), min(1.,center + half)
+
+
+def _normal_quantile(p):
+    """ Return the quantile of the standard normal distribution at
+    probability *p*, 0 < *p* < 1, by bisection. """
+
+    low, high = -40., 40.
+    for i in range(200):
+        mid = (low + high) * 0.5
+        if 0.5 * (1. + math.erf(mid / math.sqrt(2.))) < p:
+            low = mid
+        else:
+            high = mid
+
+    return (low + high) * 0.5
+
+
 def test():
     """ Return a signal object with a test signal. The signal has a
     sequence of primes as edges timing. """
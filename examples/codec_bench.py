@@ -0,0 +1,79 @@
+#!/usr/bin/python
+# .+
+# .context    : Binary Timed Signal Processing Library
+# .title      : signal serialization benchmark
+# .kind	      : python source
+# .author     : Fabrizio Pollastri
+# .site	      : Torino - Italy
+# .creation   :	18-Oct-2026
+# .copyright  :	(c) 2026 Fabrizio Pollastri
+# .license    : GNU General Public License (see below)
+#
+# This file is part of "BITIS, Binary Timed Signal Processing Library".
+#
+# BITIS is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# BITIS is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this software. If not, see <http://www.gnu.org/licenses/>.
+#
+# .-
+
+
+import bitis as bt
+import cPickle
+import random
+import time
+
+# make repeatable random sequences
+random.seed(1)
+
+# test signals: random float edges, integer ticks, regular float edges.
+edges = 100000
+noise = bt.noise(0.,0.,edges,period_mean=1.,width_mean=0.5)
+ticks = []
+tick = 0
+for i in range(edges):
+    tick += random.randint(1000,1100)
+    ticks.append(tick)
+ticks = bt.Signal(0,ticks,tick + 1,tscale=1e9)
+regular = bt.Signal(0.,[t * 1e-9 for t in ticks.edges],(tick + 1) * 1e-9)
+
+# serializers: name, dump and load functions.
+def pickle_list(signal):
+    return cPickle.dumps(signal._bts(),2)
+def unpickle_list(data):
+    return bt.Signal(*cPickle.loads(data))
+serializers = [
+    ('pickle edges list',pickle_list,unpickle_list),
+    ('pickle signal',lambda s: cPickle.dumps(s,2),cPickle.loads),
+    ('pack raw',lambda s: bt.pack_signal(s,compression=None),
+        bt.unpack_signal),
+    ('pack zlib',bt.pack_signal,bt.unpack_signal),
+    ('pack bz2',lambda s: bt.pack_signal(s,compression='bz2'),
+        bt.unpack_signal),
+    ('pack ticks zlib',lambda s: bt.pack_signal(s,tick=1e-9),
+        bt.unpack_signal)]
+
+# round trip time and size of each serializer
+print '%-18s %-8s %10s %8s %10s' % ('serializer','signal','bytes/edge',
+    'ratio','ms')
+for name, dump, load in serializers:
+    for sig_name, signal in (('noise',noise),('ticks',ticks),
+            ('regular',regular)):
+        begin = time.time()
+        data = dump(signal)
+        load(data)
+        elapse = (time.time() - begin) * 1000.
+        print '%-18s %-8s %10.2f %8.2f %10.1f' % (name,sig_name,
+            float(len(data)) / len(signal),
+            float(len(pickle_list(signal))) / len(data),elapse)
+
+#### END
@@ -28,12 +28,25 @@
 # .-
 
 
+import bisect
 import bitis as bt
+import cPickle
+import os
+import pickle
 import random
+import shutil
+import socket
+import struct
+import tempfile
 from sys import maxint
 import unittest
 
 import matplotlib.pyplot as pl
+import numpy as np
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
 
 
 class TestBitis(unittest.TestCase):
@@ -246,6 +259,120 @@ class TestBitis(unittest.TestCase):
             self.assertEqual(original,signal_out)
 
 
+    def test_ichop(self):
+        """ Test lazy chopping: chops and views against the original split
+        based chopping and the chop count without limits. """
+
+        # make random sequence repeteable
+        random.seed(1)
+
+        for s in range(10):
+            start = random.uniform(-100.,100.)
+            end = random.uniform(start,start + 100.)
+            period = (end - start) / random.uniform(10.,300.)
+            original = bt.noise(start,start,end,period_mean=period,
+                width_mean=0.2 * period)
+            origin = random.choice([None,start - 10.,start + period * 2.5])
+
+            # expected chops by subsequent splits
+            signal = original.clone()
+            if origin is None or origin <= start:
+                split = start + period
+                if not origin is None:
+                    split = start + period - (start - origin) % period
+            else:
+                signal.split(origin,inplace=True)
+                split = origin + period
+            expected = []
+            while signal:
+                older, signal = signal.split(split,inplace=True)
+                expected.append(older)
+                split += period
+
+            chops = list(original.ichop(period,origin))
+            self.assertEqual(len(expected),len(chops))
+            for chop, exp in zip(chops,expected):
+                self.assertEqual(exp.edges,chop.edges)
+                self.assertEqual(exp.slevel,chop.slevel)
+                self.assertAlmostEqual(exp.start,chop.start)
+                self.assertAlmostEqual(exp.end,chop.end)
+            views = list(original.ichop(period,origin,views=True))
+            self.assertEqual(chops,[original.view(v) for v in views])
+
+        # period must be positive
+        for period in (0,-1.):
+            self.assertRaises(ValueError,self.test.chop,period)
+            self.assertRaises(ValueError,list,self.test.ichop(period))
+
+        # no chops limit
+        chops = bt.square(0.,0.,5000.,1.,0.5).chop(1)
+        self.assertEqual(5000,len(chops))
+        self.assertEqual(bt.Signal(4999.,[4999.,4999.5],5000.,0),chops[-1])
+        chops = bt.square(0.,0.,5000.,1.,0.5).chop(1,max_chops=10)
+        self.assertEqual(10,len(chops))
+        self.assertEqual([],self.empty.chop(1))
+
+
+    def test_jitter(self):
+        """ Apply jitter with all models and order policies to a square
+        wave. Test edges order, repeatability and jitter magnitude. """
+
+        original = bt.square(0.,0.,1000.,1.,0.5)
+
+        for model in ('gauss','walk','sine','dirac'):
+            for order in ('reject','clip','resample'):
+                testing = original.clone()
+                testing.jitter(0.2,model=model,order=order,amplitude=0.1,
+                    period=10.,seed=1)
+                testing.validate()
+                self.assertEqual(len(original),len(testing))
+                self.assertEqual(original.start,testing.start)
+                self.assertEqual(original.end,testing.end)
+
+        # same seed, same jitter
+        testing1 = original.clone()
+        testing2 = original.clone()
+        testing1.jitter(0.1,seed=2)
+        testing2.jitter(0.1,seed=2)
+        self.assertEqual(testing1,testing2)
+
+        # random module seeding makes jitter repeatable
+        random.seed(1)
+        testing1 = original.clone()
+        testing1.jitter(0.1)
+        random.seed(1)
+        testing2 = original.clone()
+        testing2.jitter(0.1)
+        self.assertEqual(testing1,testing2)
+
+        # small jitter: no rejects, offsets with the expected spread
+        testing = original.clone()
+        rejected = testing.jitter(0.01,seed=3)
+        self.assertEqual(0,rejected)
+        offsets = [a - b for a, b in zip(testing.edges,original.edges)]
+        mean = sum(offsets) / len(offsets)
+        stddev = (sum([o * o for o in offsets]) / len(offsets)) ** 0.5
+        self.assertAlmostEqual(0.,mean,delta=0.002)
+        self.assertAlmostEqual(0.01,stddev,delta=0.002)
+
+        # dual dirac without random part: only +-amplitude offsets
+        testing = original.clone()
+        testing.jitter(0,model='dirac',amplitude=0.05,seed=4)
+        for a, b in zip(testing.edges,original.edges)[1:]:
+            self.assertAlmostEqual(0.05,abs(a - b))
+
+        # large jitter: clip moves all edges inside neighbour mid points
+        testing = original.clone()
+        clipped = testing.jitter(1.,order='clip',seed=5)
+        self.assertTrue(clipped > 0)
+        for a, b in zip(testing.edges,original.edges):
+            self.assertTrue(abs(a - b) <= 0.25)
+
+        # void and constant signals are jitter invariant
+        self.assertEqual(0,self.empty.jitter(1.))
+        self.assertEqual(0,self.zero0.jitter(1.))
+
+
     def test__intersect(self):
         """ Test intersection parameters. """
 
@@ -437,6 +564,728 @@ class TestBitis(unittest.TestCase):
 
 
 
+    def test_logic_operator(self):
+        """ Feed incremental logic operators with random chunks of two
+        signals. Compare the joined outputs with the logic operators computed
+        over the whole signals. """
+
+        # make random sequence repeteable
+        random.seed(1)
+
+        for t in range(10):
+            in_a = bt.noise(0.,0.,100.,period_mean=1.,width_mean=0.3)
+            in_b = bt.noise(5.,5.,120.,period_mean=2.,width_mean=0.5)
+            operators = dict([(name,bt.LogicOperator(name))
+                for name in ('and','or','xor')])
+            operators['nand'] = bt.LogicOperator(lambda a,b: not (a and b))
+            outputs = dict([(name,bt.Signal()) for name in operators])
+            rest_a = in_a
+            rest_b = in_b
+            while rest_a or rest_b:
+                chunk_a = chunk_b = None
+                if rest_a and random.randint(0,1):
+                    split = random.uniform(rest_a.start,rest_a.start + 10.)
+                    chunk_a, rest_a = rest_a.split(split)
+                if rest_b and random.randint(0,1):
+                    split = random.uniform(rest_b.start,rest_b.start + 10.)
+                    chunk_b, rest_b = rest_b.split(split)
+                for name, operator in operators.items():
+                    outputs[name].append(operator.feed(chunk_a,chunk_b))
+
+            self.assertEqual(in_a & in_b,outputs['and'])
+            self.assertEqual(in_a | in_b,outputs['or'])
+            self.assertEqual(in_a ^ in_b,outputs['xor'])
+            self.assertEqual(~(in_a & in_b),outputs['nand'])
+
+
+    def test_chunk_pipeline(self):
+        """ Process random signals as chunk iterators with few edges per
+        chunk. Compare the joined outputs with the whole signals
+        computations. """
+
+        # make random sequence repeteable
+        random.seed(1)
+
+        for t in range(10):
+            in_a = bt.noise(0.,0.,100.,period_mean=1.,width_mean=0.3)
+            in_b = bt.noise(5.,5.,120.,period_mean=2.,width_mean=0.5)
+            size_a = random.randint(1,10)
+            size_b = random.randint(1,10)
+            chunks_a = lambda: bt.ichunks(in_a,size_a)
+            chunks_b = lambda: bt.ichunks(in_b,size_b)
+
+            self.assertEqual(in_a,bt.collect(chunks_a()))
+            self.assertEqual(in_a & in_b,
+                bt.collect(bt.iand(chunks_a(),chunks_b())))
+            self.assertEqual(in_a | in_b,
+                bt.collect(bt.ior(chunks_a(),chunks_b())))
+            self.assertEqual(in_a ^ in_b,
+                bt.collect(bt.ixor(chunks_a(),chunks_b())))
+            self.assertEqual(~in_a,bt.collect(bt.iinvert(chunks_a())))
+            self.assertEqual(in_a.shift(2.5),
+                bt.collect(bt.ishift(chunks_a(),2.5)))
+            self.assertAlmostEqual(in_a.integral(0,True),
+                bt.iintegral(chunks_a(),0,True))
+            width = random.uniform(0.1,1.)
+            deglitched = in_a.deglitch(width)
+            self.assertEqual(deglitched,
+                bt.collect(bt.ideglitch(chunks_a(),width)))
+            self.assertEqual(in_a.start,deglitched.start)
+            self.assertEqual(in_a.end,deglitched.end)
+            self.assertEqual(in_a.end_level(),deglitched.end_level())
+            self.assertTrue(all([e1 - e0 >= width for e0, e1 in
+                zip(deglitched.edges[:-1],deglitched.edges[1:])]))
+
+        # edges at signal end are kept into the last chunk.
+        in_a = bt.Signal(0.,[1.,2.,3.],3.)
+        in_b = bt.Signal(0.,[0.5,3.],3.)
+        for size in (1,2,3):
+            chunks = list(bt.ichunks(in_a,size))
+            self.assertTrue(all([chunk.start < chunk.end
+                for chunk in chunks]))
+            self.assertEqual(in_a,bt.collect(chunks))
+            self.assertEqual(in_a & in_b,bt.collect(
+                bt.iand(bt.ichunks(in_a,size),bt.ichunks(in_b,size))))
+
+        # deglitch, cancelling a sequence of short pulses.
+        self.assertEqual(bt.Signal(0.,[1.,10.],12.),
+            bt.Signal(0.,[1.,5.,5.5,6.,6.5,10.],12.).deglitch(1))
+        self.assertEqual(bt.Signal(0.,[1.,11.],12.),
+            bt.Signal(0.,[1.,5.,5.5,6.,6.5,10.,10.5,11.],12.).deglitch(1))
+        self.assertEqual(self.empty,self.empty.deglitch(1))
+
+        # codecs
+        chars = [chr(random.randint(0,255)) for i in range(20)]
+        times = [i * 200. for i in range(20)]
+        sline = bt.serial_tx(chars,times)
+        self.assertEqual(sline,bt.collect(bt.iserial_tx(chars,times)))
+        received = zip(*bt.serial_rx(sline))
+        self.assertEqual(received,list(bt.iserial_rx(bt.ichunks(sline,3))))
+        codes = [(8,random.randint(0,255)) for i in range(10)]
+        pwm = bt.bin2pwm(codes,1.,2.,4.,origin=0.)
+        self.assertEqual(pwm,bt.collect(bt.ibin2pwm(codes,1.,2.,4.,origin=0.)))
+        bits = list(bt.ipwm2bin(bt.ichunks(pwm,3),1.,2.))
+        self.assertEqual(bt.pwm2bin(pwm,1.,2.),
+            (len(bits),sum([b << i for i, b in enumerate(bits)])))
+
+
+    def test_edge_server(self):
+        """ Send random edges as binary frames over local sockets to an edge
+        server. Test the received signal, the back-pressure and the dropping
+        of malformed and out of order frames. """
+
+        # make random sequence repeteable
+        random.seed(1)
+
+        edges = sorted([random.uniform(0.,100.) for i in range(1000)])
+        data = ''.join([bt.pack_frame(edges[i:i + 50])
+            for i in range(0,len(edges),50)])
+
+        # unix stream socket, data split at random positions.
+        sender, receiver = socket.socketpair(socket.AF_UNIX,socket.SOCK_STREAM)
+        server = bt.EdgeServer(max_pending=200)
+        server.add(receiver)
+        pos = 0
+        while pos < len(data):
+            size = random.randint(1,2000)
+            sender.sendall(data[pos:pos + size])
+            pos += size
+            # back-pressure: no reads over max_pending edges.
+            while server.poll():
+                self.assertTrue(server.pending_edges <= 250)
+            self.assertEqual(0,server.poll())
+            server.flush()
+        sender.close()
+        server.poll(0.1)
+        server.flush(100.)
+        self.assertEqual(bt.Signal(0.,edges,100.),server.buffer.signal())
+        self.assertEqual(0,server.errors)
+        self.assertFalse(server._sockets)
+
+        # udp socket, datagrams with out of order and malformed frames.
+        receiver = socket.socket(socket.AF_INET,socket.SOCK_DGRAM)
+        receiver.bind(('127.0.0.1',0))
+        sender = socket.socket(socket.AF_INET,socket.SOCK_DGRAM)
+        server = bt.EdgeServer(bt.StreamBuffer(elapse=10.),start=-1.,
+            slevel=1)
+        server.add(receiver)
+        sender.sendto(bt.pack_frame([1.,2.,3.]),receiver.getsockname())
+        sender.sendto(bt.pack_frame([2.5]),receiver.getsockname())
+        sender.sendto(bt.pack_frame([4.,5.]) + bt.pack_frame([6.]) + 'xx',
+            receiver.getsockname())
+        for i in range(3):
+            server.poll(0.1)
+        self.assertEqual(6,server.pending_edges)
+        self.assertEqual(2,server.errors)
+        discard, buffer = server.flush()
+        self.assertEqual(bt.Signal(-1.,[1.,2.,3.,4.,5.,6.],6.,1),
+            buffer.signal())
+        sender.close()
+        receiver.close()
+
+        # repeated and unsorted edges, partial flushes.
+        server = bt.EdgeServer()
+        for frame in ([1.,2.],[2.,3.],[5.,4.5,6.],[4.,5.,6.]):
+            server._decode(bt.pack_frame(frame))
+        self.assertEqual(2,server.errors)
+        discard, buffer = server.flush(4.5)
+        self.assertEqual(bt.Signal(0.,[1.,2.,4.],4.5),buffer.signal())
+        self.assertEqual(2,server.pending_edges)
+        self.assertEqual(bt.Signal(),server.flush(4.)[0])
+        self.assertEqual(2,server.pending_edges)
+        server._decode(bt.pack_frame([4.6]))
+        self.assertEqual(3,server.errors)
+        discard, buffer = server.flush()
+        self.assertEqual(bt.Signal(0.,[1.,2.,4.,5.,6.],6.),buffer.signal())
+        self.assertEqual(0,server.pending_edges)
+        server.flush(10.)
+        server._decode(bt.pack_frame([8.]))
+        self.assertEqual(4,server.errors)
+
+
+    def test_merge(self):
+        """ Merge random edges dealt to many nearly sorted sources, with
+        duplicates and late edges. Test the merged signal against the
+        sorted edges and the report of dropped edges. """
+
+        # make random sequence repeteable
+        random.seed(1)
+
+        for t in range(10):
+            edges = sorted(set([random.uniform(0.,100.) for i in range(500)]))
+            sources = [[] for i in range(random.randint(1,4))]
+            for edge in edges:
+                random.choice(sources).append(edge)
+            # disorder each source within window, add duplicates.
+            window = random.uniform(0.,2.)
+            duplicates = 0
+            for source in sources:
+                for i in range(len(source) - 1):
+                    if source[i + 1] - source[i] <= window and \
+                            random.randint(0,1):
+                        source[i], source[i + 1] = source[i + 1], source[i]
+                for i in range(min(5,len(source))):
+                    pos = random.randint(0,len(source) - 1)
+                    source.insert(pos,source[pos])
+                    duplicates += 1
+            report = []
+            merged = bt.collect(bt.imerge(sources,window,start=-1.,end=101.,
+                chunk_size=random.randint(1,50),report=report))
+            self.assertEqual(bt.Signal(-1.,edges,101.),merged)
+            self.assertEqual(duplicates,len(report))
+
+        # late edges
+        report = []
+        merged = bt.collect(bt.imerge([[1.,2.,3.,4.,2.5,5.]],1.,report=report,
+            chunk_size=1))
+        self.assertEqual(bt.Signal(1.,[1.,2.,3.,4.,5.],5.),merged)
+        self.assertEqual([(2.5,0,'late')],report)
+        self.assertEqual(self.empty,bt.collect(bt.imerge([[],[]],1.)))
+
+        # numpy sources and times
+        merged = bt.collect(bt.imerge([np.array([1.,3.]),np.array([2.,4.])],
+            1.,start=np.float64(0.)))
+        self.assertEqual(bt.Signal(0.,[1.,2.,3.,4.],4.),merged)
+        merged = bt.collect(bt.imerge([np.array([1,3]),np.array([2,4])],1))
+        self.assertEqual(bt.Signal(1,[1,2,3,4],4),merged)
+        self.assertEqual(int,type(merged.edges[0]))
+
+
+    def test_counter_unwrapper(self):
+        """ Unwrap random chunks of wrapping counter values. Test the
+        joined chunks against the unwrapped ticks, in ticks and seconds. """
+
+        # make random sequence repeteable
+        random.seed(1)
+
+        for bits in (8,32,48):
+            ticks = []
+            tick = random.randint(0,2**bits - 1)
+            for i in range(1000):
+                tick += random.randint(1,2**bits - 1)
+                ticks.append(tick)
+            counts = [t % 2**bits for t in ticks]
+            unwrapper = bt.CounterUnwrapper(bits,1e9)
+            seconds = bt.CounterUnwrapper(bits,1e9,seconds=True,start=0.,
+                slevel=1)
+            signal = bt.Signal()
+            signal_s = bt.Signal()
+            pos = 0
+            while pos < len(counts):
+                size = random.randint(0,100)
+                signal.append(unwrapper.feed(counts[pos:pos + size]))
+                signal_s.append(seconds.feed(np.array(counts[pos:pos + size],
+                    dtype=np.uint64)))
+                pos += size
+            base = ticks[0] - counts[0]
+            self.assertEqual(bt.Signal(counts[0],[t - base for t in ticks],
+                ticks[-1] - base,0,1e9),signal)
+            self.assertEqual(0.,signal_s.start)
+            self.assertEqual(1,signal_s.slevel)
+            for t, s in zip(signal.edges,signal_s.edges):
+                self.assertAlmostEqual(t * 1e-9,s)
+
+        # single edge at start
+        unwrapper = bt.CounterUnwrapper(8)
+        self.assertEqual(self.empty,unwrapper.feed([5]))
+        self.assertEqual(bt.Signal(5,[5,6,257],257),unwrapper.feed([6,1]))
+
+
+    def test_from_samples(self):
+        """ Build signals from random samples, as arrays, packed bytes,
+        multi lane words and memory mapped files. Test them against the
+        signal levels at sample times. """
+
+        # make random sequence repeteable
+        random.seed(1)
+        np.random.seed(1)
+
+        # random runs of equal samples
+        samples = np.repeat(np.random.randint(0,2,200).astype(bool),
+            np.random.randint(1,20,200))
+        rate = 4.
+        signal = bt.Signal.from_samples(samples,rate,start=1.,chunk_size=37)
+        self.assertEqual(1.,signal.start)
+        self.assertEqual(1. + len(samples) / rate,signal.end)
+        for i in range(len(samples)):
+            self.assertEqual(samples[i],signal.level(1. + (i + 0.5) / rate)[0])
+        self.assertEqual(signal,bt.Signal.from_samples(samples.tolist(),rate,
+            start=1.))
+
+        # packed bit stream, both bit orders.
+        samples = samples[:len(samples) // 8 * 8]
+        expected = bt.Signal.from_samples(samples,rate)
+        self.assertEqual(expected,bt.Signal.from_packed(np.packbits(samples),
+            rate,chunk_size=5))
+        packed = np.packbits(samples.reshape(-1,8)[:,::-1].ravel())
+        self.assertEqual(expected,bt.Signal.from_packed(packed,rate,
+            bitorder='little'))
+
+        # multi lane words, from a memory mapped file.
+        words = np.random.randint(0,2 ** 16,1000).astype(np.uint16)
+        words &= np.random.randint(0,2 ** 16,1000).astype(np.uint16)
+        mapped = np.memmap(os.tmpfile(),dtype=np.uint16,shape=(1000,))
+        mapped[:] = words
+        signals = bt.Signal.from_packed(mapped,rate,lanes=16,chunk_size=100)
+        self.assertEqual(16,len(signals))
+        for lane, signal in enumerate(signals):
+            self.assertEqual(bt.Signal.from_samples(words >> lane & 1,rate),
+                signal)
+        self.assertEqual([signals[3],signals[12]],
+            bt.Signal.from_packed(words,rate,lanes=[3,12]))
+
+        # no samples
+        self.assertEqual(self.empty,bt.Signal.from_samples([],rate))
+
+
+    def test_from_analog(self):
+        """ Build signals from a noisy sampled sine wave, with and without
+        hysteresis, in chunks of random size. Test edge times against the
+        sine crossings. """
+
+        # make random sequence repeteable
+        np.random.seed(1)
+
+        rate = 100.
+        times = np.arange(10000) / rate
+        sine = np.sin(2 * np.pi * times)
+        signal = bt.Signal.from_analog(sine,rate,0.5,chunk_size=333)
+        self.assertAlmostEqual(100.,signal.end)
+        self.assertEqual(0,signal.slevel)
+        self.assertEqual(200,len(signal))
+        for i, edge in enumerate(signal.edges):
+            # crossings of 0.5 at 1/12 and 5/12 of the period
+            expected = i // 2 + (1. + 4. * (i & 1)) / 12.
+            self.assertAlmostEqual(expected,edge,delta=0.001)
+
+        # noisy sine: hysteresis removes chatter.
+        noisy = sine + np.random.uniform(-0.05,0.05,len(sine))
+        chatter = bt.Signal.from_analog(noisy,rate,0.5)
+        self.assertTrue(len(chatter) > 200)
+        clean = bt.Signal.from_analog(noisy,rate,0.5,hysteresis=0.2)
+        self.assertEqual(200,len(clean))
+        for i, edge in enumerate(clean.edges):
+            expected = i // 2 + (1. + 4. * (i & 1)) / 12.
+            self.assertAlmostEqual(expected,edge,delta=0.03)
+        self.assertEqual(clean,bt.Signal.from_analog(noisy.tolist(),rate,0.5,
+            hysteresis=0.2,chunk_size=17))
+
+        # start level and void
+        self.assertEqual(1,bt.Signal.from_analog(sine + 1.,rate,0.5).slevel)
+        self.assertEqual(self.empty,bt.Signal.from_analog([],rate,0.5))
+
+        # samples exactly at threshold, also at chunk boundaries.
+        self.assertEqual(bt.Signal(0.,[],3.),
+            bt.Signal.from_analog([0.,0.5,0.],1.,0.5))
+        self.assertEqual(bt.Signal(0.,[1.,3.],5.),
+            bt.Signal.from_analog([0.,0.5,1.,0.5,0.],1.,0.5,chunk_size=2))
+
+
+    def test_to_samples(self):
+        """ Sample random signals, test samples against signal levels,
+        packed samples and sample period fractions against integrals. """
+
+        # make random sequence repeteable
+        random.seed(1)
+        np.random.seed(1)
+
+        for t in range(10):
+            signal = bt.noise(0.,0.,100.,period_mean=1.,width_mean=0.3)
+            rate = random.uniform(1.,20.)
+            t0 = random.uniform(-10.,50.)
+            t1 = random.uniform(t0 + 1.,110.)
+            samples = signal.to_samples(rate,t0,t1)
+            self.assertEqual(bool,samples.dtype)
+            for i, sample in enumerate(samples):
+                time = min(max(t0 + i / rate,0.),100.)
+                pos = bisect.bisect_right(signal.edges,time)
+                self.assertEqual(pos & 1 ^ signal.slevel,sample)
+            self.assertTrue(t0 + (len(samples) - 1) / rate < t1)
+            self.assertTrue(t0 + len(samples) / rate >= t1)
+            self.assertEqual(np.packbits(samples).tolist(),
+                signal.to_samples(rate,t0,t1,packed=True).tolist())
+            fractions = signal.to_samples(rate,t0,t1,antialias=True)
+            windows = [(t0 + i / rate,t0 + (i + 1) / rate)
+                for i in range(len(samples))]
+            integrals = signal.integrals(windows) * rate
+            self.assertTrue(np.allclose(integrals,fractions))
+
+        # back and forth from samples
+        samples = np.repeat(np.random.randint(0,2,200).astype(bool),
+            np.random.randint(1,20,200))
+        signal = bt.Signal.from_samples(samples,7.,start=3.)
+        self.assertEqual(samples.tolist(),signal.to_samples(7.).tolist())
+        self.assertEqual(0,len(self.empty.to_samples(1.)))
+
+
+    def test_save_load(self):
+        """ Save and load random signals, whole and by time windows, into
+        bts files. Test them against the original signals. """
+
+        # make random sequence repeteable
+        random.seed(1)
+
+        filename = tempfile.mktemp('.bts')
+        try:
+            for t in range(10):
+                signal = bt.noise(0.,0.,100.,period_mean=1.,width_mean=0.3)
+                signal.save(filename)
+                self.assertEqual(signal,bt.load(filename))
+                for w in range(10):
+                    t0 = random.uniform(-10.,110.)
+                    t1 = random.uniform(t0,t0 + 20.)
+                    self.assertEqual(signal.window(t0,t1),
+                        bt.load(filename,t0,t1))
+                    size = random.randint(1,20)
+                    self.assertEqual(signal.window(t0,t1),
+                        bt.collect(bt.iload(filename,size,t0,t1)))
+                chunks = list(bt.iload(filename,7))
+                self.assertTrue(all([len(chunk) <= 7 for chunk in chunks]))
+                self.assertEqual(signal,bt.collect(chunks))
+
+            # integer times, void and constant signals
+            for signal in (self.test,self.empty,self.one0,
+                    bt.Signal(0.,[],1,tscale=2)):
+                signal.save(filename)
+                loaded = bt.load(filename)
+                self.assertEqual(signal,loaded)
+                self.assertEqual(map(type,signal._bts()),
+                    map(type,loaded._bts()))
+                self.assertEqual(signal,bt.collect(bt.iload(filename,2)))
+            self.test.save(filename)
+            self.assertEqual(self.test.window(10,30),bt.load(filename,10,30))
+
+            # edge at signal end
+            signal = bt.Signal(0.,[1.,2.,3.],3.)
+            signal.save(filename)
+            for size in (1,2,3):
+                self.assertEqual(signal,bt.collect(bt.iload(filename,size)))
+
+            # edges not ascending
+            with open(filename,'r+b') as bts:
+                bts.seek(48)
+                bts.write(struct.pack('<q',0))
+            self.assertRaises(ValueError,bt.load,filename)
+
+            # not a bts file
+            with open(filename,'wb') as bts:
+                bts.write('x' * 100)
+            self.assertRaises(ValueError,bt.load,filename)
+        finally:
+            os.remove(filename)
+
+
+    def test_signal_store(self):
+        """ Record random signals into a store, a chunk at a time, on two
+        channels. Read random time windows, also from a reopened store, and
+        test them against the windows of the whole signals. """
+
+        # make random sequence repeteable
+        random.seed(1)
+
+        path = tempfile.mkdtemp()
+        try:
+            store = bt.SignalStore(path,chunk_edges=20)
+            signals = {}
+            for channel in ('a','b'):
+                signals[channel] = bt.noise(0.,0.,1000.,period_mean=1.,
+                    width_mean=0.3)
+                for chunk in signals[channel].ichop(random.uniform(1.,50.)):
+                    store.append(channel,chunk)
+            self.assertEqual(['a','b'],store.channels())
+            self.assertTrue(len(store._read_index('a')[0]) > 10)
+
+            for reopen in (False,True):
+                if reopen:
+                    store = bt.SignalStore(path)
+                for w in range(50):
+                    channel = random.choice('ab')
+                    t0 = random.uniform(-10.,1010.)
+                    t1 = random.uniform(t0,t0 + 50.)
+                    self.assertEqual(signals[channel].window(t0,t1),
+                        store.read(channel,t0,t1))
+                for channel in 'ab':
+                    self.assertEqual(signals[channel],store.read(channel))
+                    self.assertEqual(signals[channel],
+                        bt.load(os.path.join(path,channel + '.bts')))
+
+            # append must be contiguous
+            self.assertRaises(AssertionError,store.append,'a',
+                bt.Signal(10.,[],20.))
+
+            # a single long append is indexed every chunk_edges edges.
+            store = bt.SignalStore(path,chunk_edges=20)
+            signal = bt.noise(0.,0.,1000.,period_mean=1.,width_mean=0.3)
+            store.append('c',signal)
+            self.assertEqual((len(signal) - 1) // 20 + 1,
+                len(store._read_index('c')[0]))
+            for w in range(50):
+                t0 = random.uniform(-10.,1010.)
+                t1 = random.uniform(t0,t0 + 50.)
+                self.assertEqual(signal.window(t0,t1),store.read('c',t0,t1))
+
+            # edge and end types must be the channel ones.
+            store.append('d',bt.Signal(3,[4],5))
+            self.assertRaises(TypeError,store.append,'d',
+                bt.Signal(5,[6],7.5,1))
+            self.assertRaises(TypeError,store.append,'d',
+                bt.Signal(5,[6.],7,1))
+            store.append('d',bt.Signal(5,[6],7,1))
+            self.assertEqual(bt.Signal(3,[4,6],7),store.read('d'))
+        finally:
+            shutil.rmtree(path)
+
+
+    def test_vcd(self):
+        """ Write random signals into a VCD file and read them back, whole
+        and by subset, with small read blocks. Read a hand written VCD. """
+
+        # make random sequence repeteable
+        random.seed(1)
+
+        filename = tempfile.mktemp('.vcd')
+        try:
+            signals = []
+            for i in range(100):
+                edges = sorted(random.sample(xrange(1,10000),
+                    random.randint(0,100)))
+                signals.append(bt.Signal(0,edges,10000,random.randint(0,1),
+                    1e9))
+            bt.write_vcd(filename,signals)
+            read = bt.read_vcd(filename,block_size=100)
+            self.assertEqual(100,len(read))
+            for i, signal in enumerate(signals):
+                self.assertEqual(signal,read['bitis.s%d' % i])
+            names = ['bitis.s3','bitis.s97']
+            read = bt.read_vcd(filename,names)
+            self.assertEqual(sorted(names),sorted(read))
+            self.assertEqual(signals[97],read['bitis.s97'])
+
+            # float times, later start
+            signals = [bt.Signal(0.,[0.5,1.5],2.,tscale=1e3),
+                bt.Signal(1.,[1.2],2.5,tscale=1e3)]
+            bt.write_vcd(filename,signals,['a','b'],tscale=1e6)
+            read = bt.read_vcd(filename)
+            self.assertEqual(bt.Signal(0,[500,1500],2500,0,1e6),read['bitis.a'])
+            self.assertEqual(bt.Signal(0,[1200],2500,0,1e6),read['bitis.b'])
+            self.assertRaises(ValueError,bt.write_vcd,filename,signals,
+                tscale=3.)
+
+            # second and sub second timescales
+            for timescale, tscale in (('1s',1.),('10s',0.1),('100 s',0.01),
+                    ('100ms',10.),('1 fs',1e15)):
+                signal = bt.Signal(0,[1,3],4,0,tscale)
+                bt.write_vcd(filename,[signal],['a'])
+                self.assertEqual(signal,bt.read_vcd(filename)['bitis.a'])
+                self.assertEqual(tscale,
+                    bt._vcd_tscale(timescale.replace(' ','')))
+
+            # hand written, with vectors and nested scopes.
+            with open(filename,'wb') as vcd:
+                vcd.write('$date today $end\n$timescale 10ns $end\n'
+                    '$scope module top $end\n$var wire 1 ! clk $end\n'
+                    '$scope module sub $end\n$var wire 8 " bus $end\n'
+                    '$var reg 1 # q $end\n$upscope $end\n$upscope $end\n'
+                    '$enddefinitions $end\n#0\n$dumpvars\n0!\nb0 "\nx#\n'
+                    '$end\n#5\n1!\nb101 "\n#7\n1#\n#10\n0!\n1!\n#12\n0!\n'
+                    '0#\n')
+            read = bt.read_vcd(filename)
+            self.assertEqual(['top.clk','top.sub.q'],sorted(read))
+            self.assertEqual(bt.Signal(0,[5,12],12,0,1e8),read['top.clk'])
+            self.assertEqual(bt.Signal(0,[7,12],12,0,1e8),read['top.sub.q'])
+        finally:
+            os.remove(filename)
+
+
+    def test_read_csv(self):
+        """ Export random signals as analyzer rows, with redundant samples,
+        and as timestamp lines. Read them back in small chunks and test them
+        against the original signals. """
+
+        # make random sequence repeteable
+        random.seed(1)
+
+        filename = tempfile.mktemp('.csv')
+        try:
+            signals = {}
+            rows = []
+            for name in ('ch0','ch1','ch2'):
+                signal = bt.noise(0.,0.,100.,period_mean=1.,width_mean=0.3)
+                signals[name] = signal
+                level = signal.slevel
+                rows.append((0.,name,level))
+                for edge in signal.edges:
+                    # redundant samples before edge
+                    for i in range(random.randint(0,2)):
+                        rows.append((edge - random.uniform(0.,1e-3),name,
+                            level))
+                    level ^= 1
+                    rows.append((edge,name,level))
+            rows.sort()
+            with open(filename,'wb') as csv:
+                csv.write('time,channel,value\n')
+                for row in rows:
+                    csv.write('%r,%s,%d\n' % row)
+            read = bt.read_csv(filename,skip_header=1,end=100.,chunk_lines=50)
+            self.assertEqual(signals,read)
+            read = bt.read_csv(filename,['ch1'],skip_header=1,end=100.)
+            self.assertEqual({'ch1':signals['ch1']},read)
+
+            # timestamps
+            signal = signals['ch0']
+            with open(filename,'wb') as timestamps:
+                timestamps.write('# edges\n')
+                for edge in signal.edges:
+                    timestamps.write('%r\n' % edge)
+            self.assertEqual(signal,bt.read_timestamps(filename,0.,100.,
+                signal.slevel,skip_header=1,chunk_lines=7))
+
+            # integer timestamps
+            ticks = sorted(random.sample(xrange(1000000),1000))
+            with open(filename,'wb') as timestamps:
+                timestamps.write(''.join(['%d\n' % tick for tick in ticks]))
+            self.assertEqual(bt.Signal(ticks[0],ticks,ticks[-1],tscale=1e6),
+                bt.read_timestamps(filename,dtype=int,tscale=1e6))
+        finally:
+            os.remove(filename)
+
+
+    def test_pack_signal(self):
+        """ Pickle, copy, pack and unpack random signals with all codings
+        and compressions. Test them against the original signals. """
+
+        # make random sequence repeteable
+        random.seed(1)
+
+        signal = bt.noise(0.,0.,100.,period_mean=1.,width_mean=0.3)
+        ticks = bt.Signal(-5,sorted(random.sample(xrange(2 ** 40),1000)),
+            2 ** 40,1,1e9)
+        for sig in (signal,ticks,self.test,self.empty,self.one0):
+            for protocol in (0,2):
+                self.assertEqual(sig,pickle.loads(pickle.dumps(sig,protocol)))
+                self.assertEqual(sig,cPickle.loads(cPickle.dumps(sig,
+                    protocol)))
+            self.assertEqual(sig,sig.clone())
+            for compression in (None,'zlib','bz2'):
+                packed = bt.pack_signal(sig,compression=compression)
+                unpacked = bt.unpack_signal(packed)
+                self.assertEqual(sig,unpacked)
+                self.assertEqual(map(type,sig._bts()),
+                    map(type,unpacked._bts()))
+
+        # edges are packed as little endian 64 bit numbers
+        self.assertEqual(('q',struct.pack('<2q',1,2 ** 40)),
+            bt.Signal(0,[1,2 ** 40],2 ** 41).__getstate__()['edges'])
+        self.assertEqual(('d',struct.pack('<d',0.5)),
+            bt.Signal(0.,[0.5],1.).__getstate__()['edges'])
+
+        # edges are packed
+        self.assertTrue(len(pickle.dumps(signal,2)) < 8.5 * len(signal) + 200)
+        self.assertTrue(len(bt.pack_signal(ticks,compression=None))
+            < 6 * len(ticks) + 100)
+
+        # regular edges by ticks
+        edges = []
+        tick = 0
+        for i in range(1000):
+            tick += random.randint(1,3)
+            edges.append(0.001 * tick)
+        regular = bt.Signal(0.,edges,10.)
+        packed = bt.pack_signal(regular,tick=0.001)
+        self.assertTrue(len(packed) < len(regular))
+        for edge, unpacked in zip(edges,bt.unpack_signal(packed).edges):
+            self.assertAlmostEqual(edge,unpacked)
+        self.assertRaises(ValueError,bt.pack_signal,regular,tick=1.)
+
+        # edges rounded after end are clamped to the last tick before it.
+        packed = bt.pack_signal(bt.Signal(0.,[0.99],1.),tick=0.6)
+        self.assertEqual(bt.Signal(0.,[0.6],1.),bt.unpack_signal(packed))
+        packed = bt.pack_signal(bt.Signal(0.,[0.3,0.99],1.),tick=0.1)
+        self.assertEqual(1.,bt.unpack_signal(packed).edges[-1])
+        self.assertRaises(ValueError,bt.pack_signal,regular,
+            compression='nocompression')
+
+
+    def test_to_table(self):
+        """ Test numpy conversion of signals and the columnar edges table of
+        many signals. """
+
+        # make random sequence repeteable
+        random.seed(1)
+
+        signal = bt.noise(0.,0.,100.,period_mean=1.,width_mean=0.3)
+        self.assertEqual(signal.edges,np.asarray(signal).tolist())
+        self.assertEqual(np.float32,np.asarray(signal,np.float32).dtype)
+        self.assertEqual(len(signal) - 1,np.sum(np.diff(signal) > 0))
+
+        signals = [signal,self.empty,self.test]
+        table = bt.to_table(signals,['a','b','c'])
+        self.assertEqual(['a','b','c'],table['names'])
+        self.assertEqual(len(signal) + len(self.test) + 2,len(table['time']))
+        for i, sig in enumerate(signals):
+            rows = table['channel'] == i
+            if not sig:
+                self.assertFalse(rows.any())
+                continue
+            self.assertEqual([sig.start] + sig.edges,
+                table['time'][rows].tolist())
+            for time, level in zip(table['time'][rows],table['level'][rows]):
+                self.assertEqual(sig.level(time + 1e-9)[0],level)
+        empty = bt.to_table([self.empty])
+        self.assertEqual(['s0'],empty['names'])
+        self.assertEqual(0,len(empty['time']))
+
+        # arrow table
+        if pyarrow:
+            arrow = bt.to_arrow(signals,['a','b','c'])
+            self.assertEqual(table['time'].tolist(),
+                arrow.column('time').to_pylist())
+            self.assertEqual(table['level'].tolist(),
+                arrow.column('level').to_pylist())
+            self.assertEqual([table['names'][i] for i in table['channel']],
+                arrow.column('channel').to_pylist())
+
+
     def test_integral(self):
         """ Test integral of signal computation. """
 
@@ -446,6 +1295,110 @@ class TestBitis(unittest.TestCase):
         self.assertEqual(30,(~self.test).integral(0))
 
 
+    def test_integral_window(self):
+        """ Test windowed integrals and duty cycles, with and without index,
+        against integrals of the window signal cut by older and newer. """
+
+        # make random sequence repeteable
+        random.seed(1)
+
+        original = bt.noise(0.,0.,100.,period_mean=1.,width_mean=0.3)
+        indexed = original.clone().index()
+        windows = []
+        for i in range(100):
+            t0 = random.uniform(-10.,110.)
+            t1 = random.uniform(t0,t0 + 20.)
+            windows.append((t0,t1))
+            cut = original.older(t1).newer(t0)
+            for level in (0,1):
+                if cut:
+                    expected = cut.integral(level)
+                else:
+                    expected = 0.
+                self.assertAlmostEqual(expected,
+                    original.integral(level,t0=t0,t1=t1))
+                self.assertAlmostEqual(expected,
+                    indexed.integral(level,t0=t0,t1=t1))
+            if cut:
+                self.assertAlmostEqual(cut.integral(1,True),
+                    indexed.duty(t0,t1))
+
+        # vectorized integrals
+        integrals = original.integrals(windows,level=0)
+        for (t0,t1), integral in zip(windows,integrals):
+            self.assertAlmostEqual(original.integral(0,t0=t0,t1=t1),integral)
+
+        # whole signal, indexed
+        indexed = self.test.clone().index()
+        self.assertEqual(30,indexed.integral(1))
+        self.assertEqual(33,indexed.integral(0))
+        self.assertEqual(self.test,indexed)
+
+        # index is dropped when signal changes
+        indexed.shift(10,inplace=True)
+        self.assertEqual(30,indexed.integral(1,t0=9,t1=72))
+        indexed.index()
+        indexed.__invert__(inplace=True)
+        self.assertEqual(33,indexed.integral(1))
+        indexed.index()
+        expected = indexed.reverse()
+        indexed.reverse(inplace=True)
+        self.assertEqual(expected.integral(1,t0=20,t1=40),
+            indexed.integral(1,t0=20,t1=40))
+        indexed.index()
+        expected = indexed.newer(30)
+        indexed.split(30,inplace=True)
+        self.assertEqual(expected.integral(1),indexed.integral(1))
+        for method, args in (('older',(50,)),('newer',(35,)),
+                ('deglitch',(0.5,)),('jitter',(0.1,)),
+                ('append',(bt.Signal(indexed.end,[indexed.end + 1],
+                    indexed.end + 3,indexed.end_level()),))):
+            indexed.index()
+            getattr(indexed,method)(*(args + ((True,) if method in
+                ('older','newer','deglitch') else ())))
+            self.assertEqual(indexed.clone().integral(1),indexed.integral(1))
+
+        # direct edits of edges need unindex
+        signal = bt.Signal(0.,[1.,2.],3.).index()
+        signal.edges[1] = 2.9
+        self.assertEqual(1.9,signal.unindex().integral(1))
+
+
+    def test_moving_average(self):
+        """ Test moving average breakpoints and grid sampling against
+        windowed integrals. """
+
+        # make random sequence repeteable
+        random.seed(1)
+
+        for s in range(10):
+            original = bt.noise(0.,0.,100.,period_mean=1.,width_mean=0.3)
+            window = random.uniform(0.5,5.)
+            times, values = original.moving_average(window)
+            self.assertEqual(window,times[0])
+            self.assertEqual(100.,times[-1])
+            for time, value in zip(times,values):
+                self.assertAlmostEqual(
+                    original.duty(time - window,time),value)
+            # between breakpoints the average is linear
+            for time in [random.uniform(window,100.) for i in range(20)]:
+                self.assertAlmostEqual(original.duty(time - window,time),
+                    np.interp(time,times,values))
+            times, values = original.moving_average(window,step=0.5,
+                origin=0.)
+            self.assertAlmostEqual(0.,(times[0] * 2) % 1)
+            for time, value in zip(times,values):
+                self.assertAlmostEqual(
+                    original.duty(time - window,time),value)
+
+        # constant signal and too short signal
+        times, values = self.one0.moving_average(2.)
+        self.assertEqual([2.,7.],list(times))
+        self.assertEqual([1.,1.],list(values))
+        times, values = self.sig0.moving_average(8.)
+        self.assertEqual(0,len(times))
+
+
     def test_correlation(self):
         """ Test correlation function of two signals (*self* and *other*). """
 
@@ -538,6 +1491,72 @@ class TestBitis(unittest.TestCase):
             self.assertAlmostEqual(expected_phase,phase,delta=0.01)
 
 
+    def test_phase_tracker(self):
+        """ Track the drifting phase of a jittered pulse train, chunk by
+        chunk. Test phase estimates and quality against the drift. """
+
+        # pulse train with a phase drift of 0.002 per period
+        model = bt.Signal(0.,[0.,0.3],1.,0)
+        edges = []
+        for k in range(200):
+            phase = 0.2 + 0.002 * (k + 1)
+            edges += [k + phase,k + phase + 0.3]
+        signal = bt.Signal(0.,edges,201.,0)
+        signal.jitter(0.01,seed=1)
+
+        # acquire phase from first chunk, then track it.
+        tracker = bt.PhaseTracker(model,1.,0.02,0.002)
+        for chunk in signal.ichop(10.):
+            if chunk.elapse() < 10.:
+                break
+            time, phase, quality = tracker.feed(chunk)
+            expected = 0.2 + 0.002 * (time - 5.)
+            self.assertAlmostEqual(expected,phase,delta=0.006)
+            self.assertTrue(quality > 0.9)
+        self.assertEqual(20,len(tracker.phases))
+        self.assertEqual(tracker.times,[10. * (i + 1) for i in range(20)])
+
+        # filtered tracking, reference signal
+        tracker = bt.PhaseTracker(model,1.,0.02,0.002,phase=0.21,gain=0.5)
+        tracker.feed(signal.window(0.,10.))
+        self.assertTrue(0.21 <= tracker.phase <= 0.22)
+        self.assertEqual(bt.Signal(2.,[2.5,2.8,3.5],3.6,0),
+            tracker.reference(0.5,2.,3.6))
+        self.assertEqual(None,tracker.feed(self.empty))
+
+
+    def test_plot_envelope(self):
+        """ Test signal envelope against bin levels and edge counts, and
+        envelope plot redraw at zoom. """
+
+        # make random sequence repeteable
+        random.seed(1)
+
+        signal = bt.noise(0.,0.,1000.,period_mean=1.,width_mean=0.3)
+        bounds, levels, toggles = signal.envelope(100.,200.,37)
+        self.assertEqual(38,len(bounds))
+        self.assertEqual(100.,bounds[0])
+        self.assertEqual(200.,bounds[-1])
+        for i in range(37):
+            self.assertEqual(signal.level(bounds[i] + 1e-12)[0],levels[i])
+            self.assertEqual(len([e for e in signal.edges
+                if bounds[i] < e <= bounds[i + 1]]),toggles[i])
+
+        figure = pl.figure()
+        line, marks = signal.plot_envelope(width=100)
+        self.assertEqual(101,len(line.get_xdata()))
+        self.assertEqual(0.,line.get_xdata()[0])
+        self.assertTrue(len(marks.get_segments()) > 50)
+        pl.gca().set_xlim(500.,510.)
+        self.assertEqual(500.,line.get_xdata()[0])
+        self.assertEqual(510.,line.get_xdata()[-1])
+        self.assertEqual(signal.envelope(500.,510.,100)[1].tolist(),
+            line.get_ydata().tolist())
+        pl.gca().set_xlim(2000.,3000.)
+        self.assertEqual(0,len(line.get_xdata()))
+        pl.close(figure)
+
+
     def test_plotchar(self):
         """ Test semigraphic plotting. """
 
@@ -651,6 +1670,30 @@ class TestBitis(unittest.TestCase):
 
 
 
+    def test_plotchars(self):
+        """ Test multi signal semigraphic plotting against single signal
+        plotting and the time axis. """
+
+        signals = [bt.Signal(0,[1,2],4),self.empty,bt.Signal(1,[2,3],5,1)]
+        lines = bt.plotchars(signals,10,names=['a','bus','q'],ticks=4)
+        self.assertEqual(8,len(lines))
+        top, bot = signals[0].plotchar(10,0,5)
+        self.assertEqual('a   ' + top,lines[0])
+        self.assertEqual('    ' + bot,lines[1])
+        self.assertEqual('bus ' + ' ' * 10,lines[2])
+        top, bot = signals[2].plotchar(10,0,5)
+        self.assertEqual('q   ' + top,lines[4])
+        self.assertEqual('    ' + bot,lines[5])
+        self.assertEqual('    ┬───┬───┬─',lines[6])
+        self.assertEqual('    0   2   4 ',lines[7])
+
+        # no names, given domain
+        lines = bt.plotchars([self.test],16,2,66,ticks=8)
+        top, bot = self.test.plotchar(16,2,66)
+        self.assertEqual([top,bot],lines[:2])
+        self.assertEqual('2       34      ',lines[3])
+
+
     def test_pwm_codec_noperiod(self):
         """ Make a number of conversion from a random code to the
         corresponding pwm signal and back again to code. Test
@@ -765,6 +1808,59 @@ class TestBitis(unittest.TestCase):
             self.assertTrue(all([s == 0 for s in status]))
 
 
+    def test_serial_receiver(self):
+        """ Split a serial line signal in random chunks and receive them
+        with a resumable receiver. Test the equality of the received chars
+        with the ones received by serial_rx from the whole signal. """
+
+        # constants
+        parity_keys = ['off','odd','even']
+
+        # make random sequence repeteable
+        random.seed(1)
+
+        for j in range(20):
+
+            # make random serial parameters
+            char_bits = random.randint(7,8)
+            parity = parity_keys[random.randint(0,2)]
+            stop_bits = random.randint(1,2)
+
+            # make random chars and timings, add noise.
+            chars_in = []
+            timings_in = []
+            start = 0.
+            for i in range(20):
+                chars_in.append(chr(random.randint(0,2**char_bits-1)))
+                start += abs(random.gauss(0,100)) + 200
+                timings_in.append(start)
+            sline = bt.serial_tx(chars_in,timings_in,char_bits=char_bits,
+                    parity=parity,stop_bits=stop_bits)
+            if j & 1:
+                sline = sline ^ bt.noise(sline.start,sline.start,sline.end,
+                    period_mean=50,width_mean=5,active=1)
+
+            # receive random chunks, stop before signal end.
+            receiver = bt.SerialReceiver(char_bits=char_bits,parity=parity,
+                stop_bits=stop_bits)
+            received = ([],[],[])
+            sline = sline.older(random.uniform(sline.start,sline.end))
+            rest = sline
+            while rest:
+                split = random.uniform(rest.start,rest.start + 100)
+                chunk, rest = rest.split(split)
+                for r, out in zip(received,receiver.feed(chunk)):
+                    r.extend(out)
+                self.assertTrue(len(receiver.edges) <= len(chunk) + 1)
+            for r, out in zip(received,receiver.close()):
+                r.extend(out)
+
+            # compare with the whole signal reception
+            expected = bt.serial_rx(sline,char_bits=char_bits,parity=parity,
+                stop_bits=stop_bits)
+            self.assertEqual(expected,received)
+
+
     def test_code_modem(self):
         """ Simulate encode and decode with symbol modulation and correlation.
         Test the equality of the original code and the demodulated one. """
@@ -805,6 +1901,58 @@ class TestBitis(unittest.TestCase):
             self.assertEqual(code,decode)
 
 
+    def test_ber(self):
+        """ Run the bit error rate engine over serial and pwm links. Test
+        error free links, repeatability and early stop. """
+
+        # unimpaired links have no errors
+        stats = bt.ber(bt.SerialLink(chars=4,parity='odd'),trials=10,seed=1)
+        self.assertEqual(10,stats['trials'])
+        self.assertEqual(40,stats['chars'])
+        self.assertEqual(320,stats['bits'])
+        self.assertEqual(0,stats['bit_errors'])
+        self.assertEqual(0,stats['frame_errors'])
+        self.assertEqual(10,len(stats['times']))
+        stats = bt.ber(bt.PwmLink(words=2),trials=10,seed=1)
+        self.assertEqual(0,stats['bit_errors'])
+        self.assertEqual(0.,stats['ber_interval'][0])
+
+        # results do not depend on the number of processes
+        link = bt.PwmLink(words=2,jitter=0.2)
+        stats1 = bt.ber(link,trials=40,seed=2,precision=None)
+        stats2 = bt.ber(link,trials=40,seed=2,processes=2,precision=None)
+        self.assertTrue(stats1['bit_errors'] > 0)
+        for key in ('trials','char_errors','bit_errors','frame_errors'):
+            self.assertEqual(stats1[key],stats2[key])
+
+        # early stop does not depend on the number of processes
+        stats1 = bt.ber(link,trials=200,seed=5,precision=0.3)
+        self.assertTrue(stats1['stopped'])
+        for processes in (2,3,4):
+            stats2 = bt.ber(link,trials=200,seed=5,processes=processes,
+                precision=0.3)
+            for key in ('trials','char_errors','bit_errors','frame_errors'):
+                self.assertEqual(stats1[key],stats2[key])
+
+        # a noise pulse between chars adds a spurious char: the following
+        # chars are still matched to the transmitted ones.
+        link = bt.SerialLink(chars=8,gap=20.,noise={'period_mean':2.,
+            'period_stddev':0.5,'width_mean':0.01,'width_stddev':0.002})
+        for index in (2,5):
+            self.assertEqual((index,8,1,64,8),
+                bt._ber_trial((link,7,index))[:5])
+
+        # noisy link stops early, rate inside its confidence interval
+        link = bt.SerialLink(chars=8,noise={'period_mean':0.5,
+            'period_stddev':0.1,'width_mean':0.01,'width_stddev':0.005})
+        stats = bt.ber(link,trials=1000,seed=3,precision=0.2)
+        self.assertTrue(stats['stopped'])
+        self.assertTrue(stats['trials'] < 1000)
+        low, high = stats['ber_interval']
+        self.assertTrue(low < stats['ber'] < high)
+        self.assertTrue((high - low) * 0.5 <= 0.2 * stats['ber'])
+
+
     def test_stream(self):
         """ Divide a signal in several chunks by subsequent splits. Pass them
         to a stream signal. Save stream excess into an accumulator. Compare
@@ -836,6 +1984,128 @@ class TestBitis(unittest.TestCase):
             self.assertEqual(original,accumulator + stream + part_b)
 
 
+    def test_stream_buffer(self):
+        """ Pass the same signal chunks to a stream signal and to a stream
+        buffer, with time and edges number limits. Compare buffers and
+        discarded parts at each step. """
+
+        # make random sequence repeteable
+        random.seed(1)
+
+        original = bt.noise(0.,0.,500.,period_mean=1.,width_mean=0.3)
+        for elapse, max_edges in ((30.,None),(None,20),(30.,20),(None,None),
+                (0.5,None)):
+            stream = bt.Signal()
+            buf = bt.StreamBuffer(elapse,2.,max_edges,capacity=4)
+            accumulator = bt.Signal()
+            tosplit = original
+            while tosplit:
+                split = random.uniform(tosplit.start,tosplit.start + 20.)
+                part, tosplit = tosplit.split(split)
+                excess1, stream = stream.stream(part,elapse,2.,max_edges)
+                excess2, same = buf.stream(part)
+                self.assertTrue(same is buf)
+                self.assertEqual(excess1,excess2)
+                self.assertEqual(stream,buf.signal())
+                self.assertEqual(stream.edges,buf.edges())
+                self.assertEqual(len(stream),len(buf))
+                self.assertEqual(stream.end_level(),buf.end_level())
+                if not max_edges is None:
+                    self.assertTrue(len(buf) <= max_edges)
+                if not elapse is None and buf:
+                    self.assertTrue(buf.end - buf.start <= elapse)
+                accumulator.append(excess2)
+                self.assertEqual(original.older(part.end),
+                    accumulator + buf.signal())
+
+                # windows over the circular buffer
+                if buf:
+                    t0 = random.uniform(buf.start - 1.,buf.end)
+                    t1 = random.uniform(t0,buf.end + 1.)
+                    self.assertEqual(stream.window(t0,t1),buf.window(t0,t1))
+
+
+    def test_stream_group(self):
+        """ Feed two source streams with random edges, clock them at random
+        times and update dependent streams. Compare dependent streams with
+        the same operators computed on the whole source signals. """
+
+        # make random sequence repeteable
+        random.seed(1)
+
+        # streams: two sources, logic operators over them, a delayed tap.
+        in_a = bt.Stream(start=0.)
+        in_b = bt.Stream(start=0.,slevel=1)
+        and_ab = bt.Stream(lambda a, b: a & b,[in_a,in_b])
+        xor_ab = bt.Stream(lambda a, b: a ^ b,[in_a,in_b])
+        nand_abx = bt.Stream(lambda a, x: ~(a & x),[and_ab,xor_ab])
+        tap = bt.Connector(in_a,delay=2.5)
+        last = bt.Stream(lambda t: t,[tap],elapse=10.,buf_step=1.)
+        tail = bt.Stream(lambda t: t,[tap],max_edges=5)
+        group = bt.StreamGroup([last,nand_abx,tap,xor_ab,and_ab,in_b,in_a,
+            tail])
+
+        # dependent streams come after their controlling streams
+        order = group.order()
+        for stream in order:
+            for controlling in stream.controlling:
+                self.assertTrue(order.index(controlling) < order.index(stream))
+
+        # write edges and clock
+        sig_a = bt.noise(0.,0.,100.,period_mean=2.,width_mean=0.5)
+        sig_b = bt.noise(0.,0.,100.,period_mean=3.,width_mean=1.)
+        sig_a.slevel = 0
+        sig_b.slevel = 1
+        in_a.write(sig_a.edges)
+        in_b.write(sig_b.edges)
+        now = 0.
+        while now < 100.:
+            now = min(100.,now + random.uniform(0.1,5.))
+            changed = group.clock(now)
+            self.assertTrue(in_a in changed)
+            self.assertEqual(sig_a.level(now)[0],in_a.value())
+
+        # compare with whole signals computation
+        self.assertEqual(sig_a,in_a.signal())
+        self.assertEqual(sig_b,in_b.signal())
+        self.assertEqual(sig_a & sig_b,and_ab.signal())
+        self.assertEqual(sig_a ^ sig_b,xor_ab.signal())
+        self.assertEqual(~(sig_a & sig_b & (sig_a ^ sig_b)),nand_abx.signal())
+        self.assertEqual(sig_a.shift(2.5),tap.signal())
+        self.assertTrue(last.signal().elapse() <= 10.)
+        self.assertEqual(sig_a.shift(2.5).newer(last.signal().start),
+            last.signal())
+        self.assertTrue(isinstance(last.buffer,bt.StreamBuffer))
+        self.assertEqual(sig_a.shift(2.5).newer(
+            tail.signal().edges[0]),tail.signal())
+        self.assertEqual(5,len(tail.buffer))
+
+        # no time advance, no changes.
+        self.assertEqual([],group.clock(100.))
+
+        # clock past a fully drained buffer: end and level are kept.
+        drained = bt.Stream(start=0.,elapse=1.)
+        drained.write([0.5,3.5])
+        self.assertEqual(bt.Signal(0.,[0.5],2.),drained.clock(2.))
+        self.assertFalse(drained.buffer)
+        self.assertEqual(1,drained.value())
+        self.assertEqual(bt.Signal(2.,[3.5],4.,1),drained.clock(4.))
+        self.assertEqual(0,drained.value())
+
+        # late and not ascending writes are rejected, the stream goes on.
+        self.assertRaises(ValueError,drained.write,3.9)
+        self.assertRaises(ValueError,drained.write,[5.,4.5])
+        self.assertRaises(ValueError,bt.Stream(start=1.).write,0.5)
+        drained.write(4.5)
+        self.assertEqual(bt.Signal(4.,[4.5],5.),drained.clock(5.))
+
+        # circular dependency
+        loop = bt.Stream(lambda a: a,[in_a])
+        loop.controlling.append(loop)
+        loop.depending.append(loop)
+        self.assertRaises(ValueError,bt.StreamGroup([in_a,loop]).order)
+
+
 # main
 
 if __name__ == '__main__':